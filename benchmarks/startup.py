@@ -0,0 +1,133 @@
+"""
+Measure the startup time of the nervosum CLI.
+
+Runs `nervosum --help` and `nervosum ls` in fresh interpreters against a stub
+docker daemon serving a number of fake nervosum images, such that the timings
+do not depend on a real daemon. The first `ls` builds the image index in a
+temporary NERVOSUM_HOME, later ones sync it from the daemon's events:
+
+    python benchmarks/startup.py --repeat 20 --images 50
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+
+def fake_image(i: int) -> Dict[str, Any]:
+    return {
+        "Id": f"sha256:{i:064x}",
+        "RepoTags": [f"nervosum/model_{i}:v{i}"],
+        "Created": "2020-01-01T00:00:00.000000000Z",
+        "Labels": {
+            "owner": "nervosum",
+            "mode": "http",
+            "name": f"model_{i}",
+            "tag": f"v{i}",
+        },
+    }
+
+
+def stub_daemon(n_images: int) -> ThreadingHTTPServer:
+    images = {image["Id"]: image for image in map(fake_image, range(n_images))}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            path = self.path.split("?")[0]
+            body: Any
+            if path.endswith("/_ping"):
+                body = "OK"
+            elif path.endswith("/version"):
+                body = {"ApiVersion": "1.41", "Version": "20.10.0"}
+            elif path.endswith("/info"):
+                body = {"ID": "stub"}
+            elif path.endswith("/events"):
+                # No image changed since the index was last synced
+                body = ""
+            elif path.endswith("/images/json"):
+                body = [
+                    {**image, "Created": 1577836800}
+                    for image in images.values()
+                ]
+            elif path.endswith("/json") and "/images/" in path:
+                image_id = path.split("/images/")[1].rsplit("/json")[0]
+                if image_id not in images:
+                    self.send_error(404)
+                    return
+                body = {**images[image_id], "Config": {}}
+                body["Config"]["Labels"] = body["Labels"]
+            else:
+                self.send_error(404)
+                return
+
+            data = body if isinstance(body, str) else json.dumps(body)
+            encoded = data.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(encoded)))
+            self.end_headers()
+            self.wfile.write(encoded)
+
+        def log_message(self, *args: Any) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def time_command(args: List[str], env: Dict[str, str], repeat: int):
+    command = [sys.executable, "-m", "nervosum.cli.main"] + args
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(
+            command,
+            env=env,
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--images", type=int, default=20)
+    args = parser.parse_args()
+
+    server = stub_daemon(args.images)
+    # A fresh image index, such that the stub images never end up in the
+    # index of the real daemon
+    nervosum_home = tempfile.TemporaryDirectory()
+    env = {
+        **os.environ,
+        "DOCKER_HOST": f"tcp://127.0.0.1:{server.server_address[1]}",
+        "NERVOSUM_HOME": nervosum_home.name,
+    }
+
+    print(f"{'COMMAND':15s}{'MIN':>10s}{'MEDIAN':>10s}{'MAX':>10s}")
+    for command in [["--help"], ["ls"]]:
+        timings = time_command(command, env, args.repeat)
+        print(
+            f"{' '.join(command):15s}"
+            f"{min(timings) * 1000:>8.1f}ms"
+            f"{statistics.median(timings) * 1000:>8.1f}ms"
+            f"{max(timings) * 1000:>8.1f}ms"
+        )
+    server.shutdown()
+    nervosum_home.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import argparse
+import math
 from textwrap import dedent
 
 
@@ -7,6 +8,29 @@ def parse_args(args=None) -> argparse.Namespace:
     return p.parse_args(args)
 
 
+def positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"{value} is not a positive integer")
+    return number
+
+
+def positive_float(value: str) -> float:
+    number = float(value)
+    if not 0 < number < math.inf:
+        raise argparse.ArgumentTypeError(f"{value} is not a positive number")
+    return number
+
+
+def non_negative_float(value: str) -> float:
+    number = float(value)
+    if not 0 <= number < math.inf:
+        raise argparse.ArgumentTypeError(
+            f"{value} is not a non-negative number"
+        )
+    return number
+
+
 def generate_parser() -> argparse.ArgumentParser:
     p = argparse.ArgumentParser(
         description="nervosum is a tool to help you deploy python ML models"
@@ -18,6 +42,7 @@ def generate_parser() -> argparse.ArgumentParser:
     configure_parser_build(sub_parsers)
     configure_parser_run(sub_parsers)
     configure_parser_list(sub_parsers)
+    configure_parser_bench(sub_parsers)
     return p
 
 
@@ -29,13 +54,16 @@ def configure_parser_build(sub_parsers: argparse._SubParsersAction) -> None:
         """
     Examples:
         nervosum build -c config.yaml .
+        nervosum build --jobs 8 "models/*"
     """
     )
     p = sub_parsers.add_parser(
         "build", description=descr, help=help, epilog=example,
     )
     p.add_argument(
-        "dir", help="Path to model dir",
+        "dir",
+        nargs="+",
+        help="Paths to model dirs, or glob patterns matching model dirs",
     )
     p.add_argument(
         "--c",
@@ -44,6 +72,33 @@ def configure_parser_build(sub_parsers: argparse._SubParsersAction) -> None:
         default="nervosum.yaml",
         help="Path to config file",
     )
+    p.add_argument(
+        "--force",
+        action="store_true",
+        help="Build the image even if nothing changed since the last build",
+    )
+    p.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Report the size of the build context without building",
+    )
+    p.add_argument(
+        "--cache-from",
+        action="append",
+        help="Image or BuildKit cache source to reuse layers from",
+    )
+    p.add_argument(
+        "--cache-to",
+        action="store",
+        help="BuildKit cache destination to export layers to",
+    )
+    p.add_argument(
+        "--jobs",
+        "-j",
+        type=positive_int,
+        default=4,
+        help="Maximum number of models to build at the same time",
+    )
 
     p.set_defaults(nervosum_module="nervosum.core.build")
 
@@ -56,18 +111,119 @@ def configure_parser_run(sub_parsers: argparse._SubParsersAction) -> None:
         """
     Examples:
         nervosum run
+        nervosum run -n classifier --port 8080
+        nervosum run -n classifier --replicas 4 --cpus 2 --memory 4g
     """
     )
     p = sub_parsers.add_parser(
         "run", description=descr, help=help, epilog=example,
     )
+    p.add_argument(
+        "-p",
+        "--port",
+        type=int,
+        default=5000,
+        help="Host port to serve an http image on, 0 for any free port",
+    )
+    add_container_arguments(p)
+    p.set_defaults(nervosum_module="nervosum.core.run")
+
+
+def add_container_arguments(p: argparse.ArgumentParser) -> None:
+    """Arguments selecting an image and how to run its containers."""
     p.add_argument(
         "-t", "--tag", action="store", help="Tag of image to run",
     )
     p.add_argument(
         "-n", "--name", action="store", help="Name of image to run",
     )
-    p.set_defaults(nervosum_module="nervosum.core.run")
+    p.add_argument(
+        "--replicas",
+        type=positive_int,
+        default=1,
+        help=(
+            "Number of containers to run an http image in, behind a local "
+            "load balancing proxy"
+        ),
+    )
+    p.add_argument(
+        "--balance",
+        choices=["round-robin", "least-connections"],
+        default="round-robin",
+        help="How the proxy spreads connections across replicas",
+    )
+    p.add_argument(
+        "--cpus", type=float, help="Number of cpus every container may use",
+    )
+    p.add_argument(
+        "--memory",
+        help="Memory limit of every container, for example 512m or 2g",
+    )
+
+
+def configure_parser_bench(sub_parsers: argparse._SubParsersAction) -> None:
+    help = "Measure the latency and throughput of an http image"
+    descr = help
+
+    example = dedent(
+        """
+    Examples:
+        nervosum bench -n classifier
+        nervosum bench -n classifier --concurrency 32 --replicas 2
+        nervosum bench -n classifier --rate 200 --duration 60 --format json
+        nervosum bench --url http://localhost:5000
+    """
+    )
+    p = sub_parsers.add_parser(
+        "bench", description=descr, help=help, epilog=example,
+    )
+    add_container_arguments(p)
+    p.add_argument(
+        "--url",
+        help="Benchmark the model served at this url instead of an image",
+    )
+    p.add_argument(
+        "--concurrency",
+        type=positive_int,
+        default=8,
+        help=(
+            "Number of connections sending requests, or with --rate the "
+            "maximum number of open connections"
+        ),
+    )
+    p.add_argument(
+        "--rate",
+        type=positive_float,
+        help="Send this many requests per second, however fast they finish",
+    )
+    p.add_argument(
+        "--duration",
+        type=positive_float,
+        default=30,
+        help="Seconds to measure for, after the warmup",
+    )
+    p.add_argument(
+        "--warmup",
+        type=non_negative_float,
+        default=5,
+        help="Seconds to send requests for before measuring",
+    )
+    p.add_argument(
+        "--seed", type=int, default=0, help="Seed of the generated requests",
+    )
+    p.add_argument(
+        "--ready-timeout",
+        type=float,
+        default=120,
+        help="Seconds to wait for the model to be ready",
+    )
+    p.add_argument(
+        "--format",
+        choices=["table", "json"],
+        default="table",
+        help="Output format",
+    )
+    p.set_defaults(nervosum_module="nervosum.core.bench")
 
 
 def configure_parser_list(sub_parsers: argparse._SubParsersAction) -> None:
@@ -77,7 +233,8 @@ def configure_parser_list(sub_parsers: argparse._SubParsersAction) -> None:
     example = dedent(
         """
     Examples:
-        nervosum list -f classifier
+        nervosum ls -f name=classifier
+        nervosum ls -f "tag=v1*" --format json --limit 10
     """
     )
 
@@ -89,7 +246,21 @@ def configure_parser_list(sub_parsers: argparse._SubParsersAction) -> None:
         "-f",
         "--filter",
         action="append",
-        help="Filter on a specific label given to the image",
+        help=(
+            "Filter on a label given to the image, as key=value for an "
+            "exact match or key=value* for a prefix match"
+        ),
+    )
+    p.add_argument(
+        "--format",
+        choices=["table", "json"],
+        default="table",
+        help="Output format",
+    )
+    p.add_argument(
+        "--limit",
+        type=int,
+        help="Only list the given number of most recently created images",
     )
 
     p.set_defaults(nervosum_module="nervosum.core.list")
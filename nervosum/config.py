@@ -1,8 +1,7 @@
 from pathlib import Path
-from typing import List, Optional, Union
+from typing import Dict, List, Optional, Union
 
-import yaml
-from pydantic import BaseModel, validator
+from pydantic import BaseModel, root_validator, validator
 
 
 class SchemaField(BaseModel):
@@ -10,9 +9,130 @@ class SchemaField(BaseModel):
     type: str
 
 
+class BatchingField(BaseModel):
+    enabled: bool = False
+    max_batch_size: int = 32
+    max_wait_ms: float = 5.0
+    stream_chunk_size: int = 1000
+
+    @validator("max_batch_size", "stream_chunk_size")
+    def at_least_one(cls, v: int):
+        if v < 1:
+            raise ValueError("must be at least 1")
+        return v
+
+    @validator("max_wait_ms")
+    def not_negative(cls, v: float):
+        if v < 0:
+            raise ValueError("max_wait_ms must not be negative")
+        return v
+
+
+class ServerField(BaseModel):
+    engine: str = "flask"
+    workers: Optional[int] = None
+    threads: int = 1
+    keepalive: int = 2
+    preload: bool = False
+
+    @validator("engine")
+    def engine_supported(cls, v: str):
+        if v not in ["flask", "gunicorn", "uvicorn"]:
+            raise ValueError(f"Server engine {v} not yet supported")
+        return v
+
+    @validator("preload")
+    def preload_needs_workers(cls, v: bool, values):
+        if v and values.get("engine") == "flask":
+            raise ValueError("preload requires the gunicorn or uvicorn engine")
+        return v
+
+    @validator("workers", "threads")
+    def at_least_one(cls, v: Optional[int]):
+        if v is not None and v < 1:
+            raise ValueError("must be at least 1")
+        return v
+
+
+class CacheField(BaseModel):
+    enabled: bool = False
+    max_size: int = 10000
+    ttl_seconds: float = 300
+
+    @validator("max_size")
+    def at_least_one(cls, v: int):
+        if v < 1:
+            raise ValueError("max_size must be at least 1")
+        return v
+
+
+class DataSourceField(BaseModel):
+    format: str = "csv"
+    options: Dict[str, str] = {}
+
+    @validator("format")
+    def format_supported(cls, v: str):
+        if v not in ["csv", "parquet", "orc"]:
+            raise ValueError(f"Format {v} not yet supported")
+        return v
+
+
+class DataOutputField(DataSourceField):
+    mode: str = "overwrite"
+    partition_by: List[str] = []
+    compression: Optional[str] = None
+
+    @validator("mode")
+    def mode_supported(cls, v: str):
+        if v not in ["overwrite", "append", "ignore", "error"]:
+            raise ValueError(f"Save mode {v} not yet supported")
+        return v
+
+
+class SparkField(BaseModel):
+    arrow_max_records_per_batch: Optional[int] = None
+    partitions: Optional[int] = None
+    passthrough_columns: List[str] = []
+    persist: Optional[str] = None
+    preview_rows: int = 20
+    reuse_worker: bool = True
+
+    @validator("arrow_max_records_per_batch", "partitions")
+    def at_least_one(cls, v: Optional[int]):
+        if v is not None and v < 1:
+            raise ValueError("must be at least 1")
+        return v
+
+    @validator("persist")
+    def persist_supported(cls, v: Optional[str]):
+        if v not in [
+            None,
+            "memory_only",
+            "memory_and_disk",
+            "disk_only",
+            "checkpoint",
+        ]:
+            raise ValueError(f"Persist level {v} not yet supported")
+        return v
+
+    @validator("preview_rows")
+    def not_negative(cls, v: int):
+        if v < 0:
+            raise ValueError("preview_rows must not be negative")
+        return v
+
+
 class DeploymentField(BaseModel):
     mode: str
     platform_tag: Optional[str] = None
+    server: ServerField = ServerField()
+    batching: BatchingField = BatchingField()
+    binary_formats: List[str] = []
+    cache: CacheField = CacheField()
+    source: DataSourceField = DataSourceField()
+    output: DataOutputField = DataOutputField()
+    spark: SparkField = SparkField()
+    dependencies: str = "zip"
 
     @validator("mode")
     def mode_in_http_batch(cls, v: str):
@@ -20,6 +140,18 @@ class DeploymentField(BaseModel):
             raise ValueError(f"Mode {v} not yet supported")
         return v
 
+    @validator("binary_formats", each_item=True)
+    def binary_format_supported(cls, v: str):
+        if v not in ["arrow", "numpy"]:
+            raise ValueError(f"Binary format {v} not yet supported")
+        return v
+
+    @validator("dependencies")
+    def dependencies_supported(cls, v: str):
+        if v not in ["zip", "image", "archive"]:
+            raise ValueError(f"Dependency mode {v} not yet supported")
+        return v
+
     @validator("platform_tag")
     def check_platform_tag(cls, v, values):
         if values["mode"] == "batch":
@@ -31,6 +163,7 @@ class DeploymentField(BaseModel):
 class Interface(BaseModel):
     model_module: str
     model_class: str
+    deterministic: bool = True
 
     @validator("model_class")
     def no_spaces(cls, x: str):
@@ -53,6 +186,15 @@ class NervosumConfig(BaseModel):
     def replace_slash_with_dot(cls, v: str):
         return v.replace("/", ".")
 
+    @root_validator(skip_on_failure=True)
+    def cache_needs_deterministic_model(cls, values):
+        if (
+            values["deployment"].cache.enabled
+            and not values["interface"].deterministic
+        ):
+            raise ValueError("Prediction cache requires a deterministic model")
+        return values
+
 
 def get_config(config_file: Union[Path, str]) -> NervosumConfig:
     """
@@ -66,6 +208,8 @@ def get_config(config_file: Union[Path, str]) -> NervosumConfig:
         file
 
     """
+    import yaml
+
     with open(config_file) as file:
         # The FullLoader parameter handles the conversion from YAML
         # scalar values to Python the dictionary format
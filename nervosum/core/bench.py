@@ -0,0 +1,433 @@
+import argparse
+import asyncio
+import http.client
+import json
+import logging
+import math
+import random
+import string
+import sys
+import time
+import urllib.request
+from typing import TYPE_CHECKING, Any, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlsplit
+
+from nervosum.core import run
+from nervosum.core.proxy import Backend, LoadBalancer, TCPProxy
+
+if TYPE_CHECKING:
+    from docker.models.containers import Container
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.StreamHandler())
+logger.setLevel("DEBUG")
+
+READY_POLL_SECONDS = 0.5
+
+
+class Sample(NamedTuple):
+    # Seconds since the start of the benchmark the request was due
+    due: float
+    latency: float
+    # None when no response was received
+    status: Optional[int]
+    # The response held an error rather than a prediction
+    failed: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return (
+            self.status is not None and self.status < 400 and not self.failed
+        )
+
+
+class BenchResult(NamedTuple):
+    target: str
+    load: str
+    duration: float
+    requests: int
+    errors: int
+    error_rate: float
+    throughput: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    mean_ms: float
+    max_ms: float
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of sorted values, q between 0 and 100."""
+    if not sorted_values:
+        return float("nan")
+    rank = max(1, math.ceil(q * len(sorted_values) / 100))
+    return sorted_values[rank - 1]
+
+
+def generate_value(type_name: str, rng: random.Random) -> Any:
+    type_name = type_name.lower()
+    if type_name == "int":
+        return rng.randint(0, 1000)
+    if type_name == "float":
+        return rng.uniform(0, 1000)
+    if type_name == "bool":
+        return rng.random() < 0.5
+    if type_name == "str":
+        return "".join(rng.choices(string.ascii_letters, k=8))
+    # Values of other types are passed to the model unvalidated, nervosum
+    # cannot tell what they should look like.
+    return None
+
+
+def generate_record(
+    input_schema: List[Dict[str, str]], rng: random.Random
+) -> Dict[str, Any]:
+    """Synthetic record with a random value for every input field."""
+    return {
+        field["name"]: generate_value(field["type"], rng)
+        for field in input_schema
+    }
+
+
+def is_error_response(content: bytes) -> bool:
+    """
+    Whether a response is an error, which the wrapper also answers with
+    status 200, as {"error": ...}.
+    """
+    try:
+        payload = json.loads(content)
+    except ValueError:
+        return True
+    return isinstance(payload, dict) and "error" in payload
+
+
+class HTTPConnection:
+    """
+    Minimal asyncio HTTP/1.1 client keeping its connection alive between
+    requests, such that the benchmark measures the server rather than the
+    cost of connecting.
+    """
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+        self.reader, self.writer = None, None
+
+    async def request(
+        self, method: str, path: str, body: bytes = b""
+    ) -> Tuple[int, bytes]:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(
+                self.host, self.port
+            )
+        reader, writer = self.reader, self.writer
+        assert reader is not None
+        writer.write(
+            (
+                f"{method} {path} HTTP/1.1\r\n"
+                f"Host: {self.host}:{self.port}\r\n"
+                "Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n"
+            ).encode("latin-1")
+            + body
+        )
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError("Connection closed by the server")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip().lower()
+
+        if headers.get("transfer-encoding") == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                chunks.append(await reader.readexactly(size + 2))
+                if size == 0:
+                    break
+            content = b"".join(chunk[:-2] for chunk in chunks)
+        elif "content-length" in headers:
+            content = await reader.readexactly(int(headers["content-length"]))
+        else:
+            content = await reader.read()
+            headers["connection"] = "close"
+        if headers.get("connection") == "close":
+            self.close()
+        return status, content
+
+
+class LoadGenerator:
+    """
+    Sends synthetic records to /predict, either from a fixed number of
+    connections each sending its next request when the previous one was
+    answered (concurrency), or at a fixed arrival rate regardless of how
+    fast the server answers (rate).
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        input_schema: List[Dict[str, str]],
+        seed: int = 0,
+        path: str = "/predict",
+    ):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.input_schema = input_schema
+        self.rng = random.Random(seed)
+        self.samples: List[Sample] = []
+        self.start = 0.0
+
+    def next_body(self) -> bytes:
+        record = generate_record(self.input_schema, self.rng)
+        return json.dumps(record).encode("utf-8")
+
+    async def send(self, connection: HTTPConnection, due: float) -> None:
+        """Send one request, measuring its latency from when it was due."""
+        body = self.next_body()
+        status: Optional[int] = None
+        failed = False
+        try:
+            status, content = await connection.request("POST", self.path, body)
+            failed = is_error_response(content)
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            connection.close()
+        latency = time.perf_counter() - self.start - due
+        self.samples.append(Sample(due, latency, status, failed))
+
+    async def run_concurrency(self, concurrency: int, duration: float) -> None:
+        self.start = time.perf_counter()
+
+        async def worker() -> None:
+            connection = HTTPConnection(self.host, self.port)
+            try:
+                while True:
+                    due = time.perf_counter() - self.start
+                    if due >= duration:
+                        return
+                    await self.send(connection, due)
+            finally:
+                connection.close()
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    async def run_rate(
+        self, rate: float, duration: float, max_connections: int
+    ) -> None:
+        """
+        Requests that find all connections busy wait for one, which counts
+        towards their latency, as it would for a real client.
+        """
+        idle: List[HTTPConnection] = []
+        slots = asyncio.Semaphore(max_connections)
+
+        async def send_when_free(due: float) -> None:
+            async with slots:
+                connection = (
+                    idle.pop()
+                    if idle
+                    else HTTPConnection(self.host, self.port)
+                )
+                await self.send(connection, due)
+                idle.append(connection)
+
+        self.start = time.perf_counter()
+        tasks = []
+        count = int(rate * duration)
+        for i in range(count):
+            due = i / rate
+            delay = due - (time.perf_counter() - self.start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.ensure_future(send_when_free(due)))
+        await asyncio.gather(*tasks)
+        for connection in idle:
+            connection.close()
+
+
+def summarize(
+    samples: List[Sample], target: str, load: str, warmup: float
+) -> BenchResult:
+    """
+    Statistics of the samples due after the warmup. Latency percentiles
+    cover successful requests only.
+    """
+    measured = [s for s in samples if s.due >= warmup]
+    if measured:
+        duration = max(s.due + s.latency for s in measured) - warmup
+    else:
+        duration = 0.0
+    latencies = sorted(s.latency * 1000 for s in measured if s.ok)
+    errors = sum(1 for s in measured if not s.ok)
+    return BenchResult(
+        target=target,
+        load=load,
+        duration=round(duration, 3),
+        requests=len(measured),
+        errors=errors,
+        error_rate=errors / len(measured) if measured else 0.0,
+        throughput=len(latencies) / duration if duration else 0.0,
+        p50_ms=percentile(latencies, 50),
+        p95_ms=percentile(latencies, 95),
+        p99_ms=percentile(latencies, 99),
+        mean_ms=sum(latencies) / len(latencies) if latencies else float("nan"),
+        max_ms=latencies[-1] if latencies else float("nan"),
+    )
+
+
+def format_result_table(result: BenchResult) -> str:
+    rows = [
+        ("TARGET", result.target),
+        ("LOAD", result.load),
+        ("DURATION", f"{result.duration:.1f}s"),
+        ("REQUESTS", str(result.requests)),
+        ("ERRORS", f"{result.errors} ({result.error_rate:.2%})"),
+        ("THROUGHPUT", f"{result.throughput:.1f} req/s"),
+        ("LATENCY P50", f"{result.p50_ms:.1f}ms"),
+        ("LATENCY P95", f"{result.p95_ms:.1f}ms"),
+        ("LATENCY P99", f"{result.p99_ms:.1f}ms"),
+        ("LATENCY MEAN", f"{result.mean_ms:.1f}ms"),
+        ("LATENCY MAX", f"{result.max_ms:.1f}ms"),
+    ]
+    return "\n".join(f"{name:15s}{value}" for name, value in rows)
+
+
+def format_result_json(result: BenchResult) -> str:
+    # NaN, when no request succeeded, is not valid json
+    return json.dumps(
+        {
+            key: None if isinstance(value, float) and value != value else value
+            for key, value in result._asdict().items()
+        },
+        indent=2,
+    )
+
+
+def http_get_json(url: str, timeout: float = 5) -> Any:
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return json.loads(response.read().decode("utf-8"))
+
+
+def wait_until_ready(
+    url: str, timeout: float, containers: Optional[List["Container"]] = None,
+) -> None:
+    """
+    Poll the /ready endpoint until it answers with status 200.
+
+    Raises:
+        TimeoutError: The server was not ready within timeout seconds
+        RuntimeError: One of the containers exited
+
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            http_get_json(f"{url}/ready")
+            return
+        except (OSError, ValueError, http.client.HTTPException):
+            # Refused, reset or 503 while the model loads
+            pass
+        for container in containers or []:
+            container.reload()
+            if container.status in ["exited", "dead"]:
+                raise RuntimeError(
+                    f"Container {container.short_id} exited:\n"
+                    + container.logs(tail=20).decode("utf-8", "replace")
+                )
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"{url} was not ready after {timeout}s")
+        time.sleep(READY_POLL_SECONDS)
+
+
+async def bench(
+    host: str,
+    port: int,
+    target: str,
+    args: argparse.Namespace,
+    base_path: str = "",
+) -> BenchResult:
+    """Benchmark the model served at http://host:port/base_path."""
+    # Not on the event loop, which may also run the proxy answering it
+    schema = await asyncio.get_running_loop().run_in_executor(
+        None, http_get_json, f"http://{host}:{port}{base_path}/schema"
+    )
+    generator = LoadGenerator(
+        host, port, schema["input_schema"], args.seed, f"{base_path}/predict"
+    )
+    duration = args.warmup + args.duration
+    if args.rate is not None:
+        load = f"{args.rate:g} req/s"
+        logger.info(f"Sending {load} for {duration:g}s")
+        await generator.run_rate(args.rate, duration, args.concurrency)
+    else:
+        load = f"{args.concurrency} connections"
+        logger.info(f"Sending requests over {load} for {duration:g}s")
+        await generator.run_concurrency(args.concurrency, duration)
+    return summarize(generator.samples, target, load, args.warmup)
+
+
+async def bench_replicas(
+    containers: List["Container"], target: str, args: argparse.Namespace
+) -> BenchResult:
+    backends = [Backend("127.0.0.1", run.get_host_port(c)) for c in containers]
+    for backend in backends:
+        await asyncio.get_running_loop().run_in_executor(
+            None,
+            wait_until_ready,
+            f"http://{backend}",
+            args.ready_timeout,
+            containers,
+        )
+    if len(backends) == 1:
+        return await bench("127.0.0.1", backends[0].port, target, args)
+    proxy = TCPProxy(LoadBalancer(backends, args.balance), port=0)
+    port = await proxy.start()
+    try:
+        return await bench("127.0.0.1", port, target, args)
+    finally:
+        await proxy.close()
+
+
+def execute(args: argparse.Namespace) -> None:
+    if args.url:
+        url = urlsplit(args.url)
+        if url.scheme != "http":
+            logger.error(f"Only http urls can be benchmarked, not {args.url}.")
+            sys.exit(1)
+        host, port = url.hostname or "127.0.0.1", url.port or 80
+        # Models served behind a reverse proxy under a path prefix
+        base_path = url.path.rstrip("/")
+        wait_until_ready(f"http://{url.netloc}{base_path}", args.ready_timeout)
+        result = asyncio.run(bench(host, port, args.url, args, base_path))
+    else:
+        image = run.select_image(args)
+        if image.mode != "http":
+            logger.error("Only http images can be benchmarked.")
+            sys.exit(1)
+        target = f"{image.name}:{image.tag} ({image.short_id})"
+        containers = run.start_replicas(image, args)
+        try:
+            logger.info("Waiting for the model to be ready")
+            result = asyncio.run(bench_replicas(containers, target, args))
+        finally:
+            run.stop_containers(containers)
+
+    if args.format == "json":
+        print(format_result_json(result))
+    else:
+        print(format_result_table(result))
@@ -1,29 +1,155 @@
 import argparse
+import glob
+import logging
 import os
-import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional
 
 from nervosum.config import get_config
+from nervosum.core import streaming, utils
+from nervosum.core.build_cache import BuildCache
+from nervosum.core.build_context import get_context_size
 from nervosum.core.builders.batch_image_builder import BatchImageBuilder
 from nervosum.core.builders.flask_image_builder import FlaskImageBuilder
 from nervosum.core.builders.image_builder import ImageBuilder
 
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.StreamHandler())
+logger.setLevel("INFO")
+
+
+class BuildResult(NamedTuple):
+    source_dir: str
+    status: str
+    seconds: float
+    image_id: Optional[str] = None
+
+
+def format_size(size: float) -> str:
+    for unit in ["B", "kB", "MB", "GB"]:
+        if size < 1000 or unit == "GB":
+            break
+        size /= 1000
+    return f"{size:.1f} {unit}"
 
-def execute(args: argparse.Namespace):
-    config_file = os.path.join(args.dir, args.c)
-    config = get_config(config_file)
 
-    with tempfile.TemporaryDirectory(dir=os.path.abspath(args.dir)) as td:
-        if config.deployment.mode == "batch":
-            builder: ImageBuilder = BatchImageBuilder(
-                source_dir=args.dir, target_dir=td
+def print_context_size(
+    source_dir: str, wrapper_files: Dict[str, str], prefix: str = ""
+):
+    total, sizes = get_context_size(source_dir, wrapper_files)
+    lines = [f"Build context: {format_size(total)}"]
+    for name, size in sorted(sizes.items(), key=lambda item: -item[1]):
+        lines.append(f"  {format_size(size):>10s}  {name}")
+    streaming.print_lines(["\n".join(lines)], prefix)
+
+
+def expand_dirs(patterns: List[str]) -> List[str]:
+    """
+    Expand glob patterns among the given model directories, in order and
+    without duplicates.
+    """
+    dirs: List[str] = []
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            matches = sorted(
+                match for match in glob.glob(pattern) if os.path.isdir(match)
             )
-        elif config.deployment.mode == "http":
-            builder = FlaskImageBuilder(source_dir=args.dir, target_dir=td)
+            if not matches:
+                raise ValueError(f"No model directory matches {pattern}")
         else:
-            raise NotImplementedError(
-                f"Currently no support for mode {config.deployment.mode}"
+            matches = [pattern]
+        dirs += [match for match in matches if match not in dirs]
+    return dirs
+
+
+def build_model(
+    source_dir: str,
+    args: argparse.Namespace,
+    cache: BuildCache,
+    buildkit: bool,
+    prefix: str = "",
+) -> BuildResult:
+    start = time.time()
+    config_file = os.path.join(source_dir, args.c)
+    config = get_config(config_file)
+
+    if config.deployment.mode == "batch":
+        builder: ImageBuilder = BatchImageBuilder(
+            source_dir=source_dir, buildkit=buildkit, prefix=prefix
+        )
+    elif config.deployment.mode == "http":
+        builder = FlaskImageBuilder(
+            source_dir=source_dir, buildkit=buildkit, prefix=prefix
+        )
+    else:
+        raise NotImplementedError(
+            f"Currently no support for mode {config.deployment.mode}"
+        )
+
+    wrapper_files = builder.render_wrapper_files(config)
+    if args.dry_run:
+        print_context_size(source_dir, wrapper_files, prefix)
+        return BuildResult(source_dir, "dry run", time.time() - start)
+
+    build_hash = cache.hash_build(config, wrapper_files, source_dir)
+    image_id = cache.get_image(build_hash)
+    if image_id is not None and not args.force:
+        if builder.tag_image(config, image_id):
+            logger.info(
+                f"{prefix}Nothing changed since image {image_id[7:19]} was "
+                "built, skipping build"
+            )
+            return BuildResult(
+                source_dir, "cached", time.time() - start, image_id
             )
 
-        builder.generate_wrapper_files(config)
-        builder.copy_client_files_to_build_dir()
-        builder.build_image(config)
+    image_id = builder.build_image(
+        config,
+        wrapper_files,
+        cache_from=args.cache_from,
+        cache_to=args.cache_to,
+    )
+    if image_id is None:
+        return BuildResult(source_dir, "failed", time.time() - start)
+
+    cache.add_image(build_hash, image_id)
+    cache.save()
+    return BuildResult(source_dir, "built", time.time() - start, image_id)
+
+
+def print_summary(results: List[BuildResult]) -> None:
+    width = max(len("MODEL"), *(len(r.source_dir) for r in results)) + 2
+    print(f"{'MODEL':{width}s}{'STATUS':10s}{'DURATION':10s}IMAGE")
+    for result in results:
+        image_id = result.image_id[7:19] if result.image_id else ""
+        print(
+            f"{result.source_dir:{width}s}{result.status:10s}"
+            f"{result.seconds:<10.1f}{image_id}"
+        )
+
+
+def execute(args: argparse.Namespace):
+    source_dirs = expand_dirs(args.dir)
+    cache = BuildCache()
+    buildkit = utils.buildkit_available()
+
+    def build(source_dir: str) -> BuildResult:
+        # Tell the output of concurrent builds apart by their directory
+        prefix = f"[{source_dir}] " if len(source_dirs) > 1 else ""
+        start = time.time()
+        try:
+            return build_model(source_dir, args, cache, buildkit, prefix)
+        except Exception:
+            logger.exception(f"{prefix}Build failed")
+            return BuildResult(source_dir, "failed", time.time() - start)
+
+    jobs = min(args.jobs, len(source_dirs))
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        results = list(pool.map(build, source_dirs))
+    cache.save()
+
+    if len(source_dirs) > 1:
+        print_summary(results)
+    if any(result.status == "failed" for result in results):
+        raise SystemExit(1)
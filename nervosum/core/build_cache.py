@@ -0,0 +1,128 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+from nervosum.config import NervosumConfig
+from nervosum.core import utils
+from nervosum.core.build_context import iter_source_files
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "build-cache.json"
+
+
+class BuildCache:
+    """
+    Local manifest mapping the hash of everything that goes into an image to
+    the ID of the image built from it.
+
+    Hashes of source files are remembered by size and modification time,
+    such that unchanged files are not read again. Only the files a source
+    directory held when it was last hashed are remembered. A cache can be
+    shared by concurrent builds.
+    """
+
+    def __init__(self, manifest_path: Optional[str] = None):
+        self.manifest_path = manifest_path or os.path.join(
+            utils.get_nervosum_dir(), MANIFEST_FILE
+        )
+        self.lock = threading.Lock()
+        self.images, self.files = self.read_manifest()
+        # Files no longer in their source directory, left out when saving
+        self.removed_files: Set[str] = set()
+
+    def read_manifest(self) -> Tuple[Dict[str, str], Dict[str, List]]:
+        if os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path) as f:
+                    manifest = json.load(f)
+                return manifest["images"], manifest["files"]
+            except (ValueError, KeyError):
+                logger.warning(
+                    f"Ignoring corrupt build cache {self.manifest_path}"
+                )
+        return {}, {}
+
+    def hash_file(self, path: str) -> str:
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        entry = self.files.get(path)
+        if entry is not None and entry[:2] == [stat.st_size, stat.st_mtime_ns]:
+            return entry[2]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        with self.lock:
+            self.files[path] = [
+                stat.st_size,
+                stat.st_mtime_ns,
+                digest.hexdigest(),
+            ]
+        return digest.hexdigest()
+
+    def hash_build(
+        self,
+        config: NervosumConfig,
+        wrapper_files: Dict[str, str],
+        source_dir: str,
+    ) -> str:
+        """
+        Hash the config, the rendered wrapper files and every file in the
+        source directory.
+        """
+        digest = hashlib.sha256()
+        digest.update(config.json(sort_keys=True).encode("utf-8"))
+        for file_name in sorted(wrapper_files):
+            digest.update(f"\0wrapper\0{file_name}\0".encode("utf-8"))
+            digest.update(wrapper_files[file_name].encode("utf-8"))
+        seen = set()
+        for relative_path, path in iter_source_files(source_dir):
+            entry_hash = "" if os.path.isdir(path) else self.hash_file(path)
+            seen.add(os.path.abspath(path))
+            digest.update(
+                f"\0source\0{relative_path}\0{entry_hash}".encode("utf-8")
+            )
+        self.prune_files(source_dir, seen)
+        return digest.hexdigest()
+
+    def prune_files(self, source_dir: str, seen: Set[str]) -> None:
+        """Forget the files in source_dir which were not seen hashing it."""
+        prefix = os.path.join(os.path.abspath(source_dir), "")
+        with self.lock:
+            removed = [
+                path
+                for path in self.files
+                if path.startswith(prefix) and path not in seen
+            ]
+            for path in removed:
+                del self.files[path]
+            self.removed_files.update(removed)
+
+    def get_image(self, build_hash: str) -> Optional[str]:
+        return self.images.get(build_hash)
+
+    def add_image(self, build_hash: str, image_id: str) -> None:
+        with self.lock:
+            self.images[build_hash] = image_id
+
+    def save(self) -> None:
+        with self.lock:
+            # Keep what other nervosum processes added since it was read
+            images, files = self.read_manifest()
+            images.update(self.images)
+            files.update(self.files)
+            for path in self.removed_files:
+                files.pop(path, None)
+            self.images, self.files = images, files
+
+            # Write to a temporary file first, such that concurrent builds
+            # never read a half written manifest.
+            partial = f"{self.manifest_path}.{os.getpid()}.partial"
+            with open(partial, "w") as f:
+                json.dump({"images": self.images, "files": self.files}, f)
+            os.replace(partial, self.manifest_path)
@@ -0,0 +1,227 @@
+import logging
+import os
+import re
+import stat
+import tarfile
+import time
+from typing import Dict, Iterator, List, NamedTuple, Optional, Pattern, Tuple
+
+logger = logging.getLogger(__name__)
+
+BLOCK_SIZE = tarfile.BLOCKSIZE
+CHUNK_SIZE = 1 << 20
+IGNORE_FILES = [".nervosumignore", ".dockerignore"]
+IGNORE_TOKENS = re.compile(r"(\*\*/|\*\*|\*|\?|\[[^\]]+\])")
+
+
+class IgnorePattern(NamedTuple):
+    regex: Pattern
+    exclusion: bool
+
+
+def compile_ignore_pattern(pattern: str) -> Pattern:
+    """
+    Translate a .dockerignore pattern to a regular expression. `*` and `?`
+    match within one path segment, `**` matches any number of segments.
+    """
+    parts = []
+    for token in IGNORE_TOKENS.split(pattern):
+        if token == "**/":
+            parts.append("(?:.*/)?")
+        elif token == "**":
+            parts.append(".*")
+        elif token == "*":
+            parts.append("[^/]*")
+        elif token == "?":
+            parts.append("[^/]")
+        elif token.startswith("[") and token.endswith("]"):
+            parts.append("[^" + token[2:] if token[1] == "!" else token)
+        else:
+            parts.append(re.escape(token))
+    return re.compile("".join(parts) + "$")
+
+
+class IgnoreRules:
+    """
+    Patterns of files to leave out of the build context, following the
+    syntax of .dockerignore: one pattern per line relative to the build
+    directory, `#` starts a comment and a leading `!` re-includes paths.
+    The last pattern matching a path decides.
+    """
+
+    def __init__(self, lines: List[str]):
+        self.patterns: List[IgnorePattern] = []
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            exclusion = line.startswith("!")
+            if exclusion:
+                line = line[1:].strip()
+            line = os.path.normpath(line).replace(os.sep, "/").lstrip("/")
+            self.patterns.append(
+                IgnorePattern(compile_ignore_pattern(line), exclusion)
+            )
+        self.has_exclusions = any(p.exclusion for p in self.patterns)
+
+    @classmethod
+    def from_dir(cls, source_dir: str) -> "IgnoreRules":
+        """
+        Read .nervosumignore from source_dir, or .dockerignore when there is
+        none.
+        """
+        for ignore_file in IGNORE_FILES:
+            path = os.path.join(source_dir, ignore_file)
+            if os.path.isfile(path):
+                with open(path) as f:
+                    return cls(f.read().splitlines())
+        return cls([])
+
+    def ignored(self, relative_path: str) -> bool:
+        """
+        Whether the path, relative to the build directory with "/" as
+        separator, is left out. A pattern matching a directory matches
+        everything in it.
+        """
+        segments = relative_path.split("/")
+        candidates = [
+            "/".join(segments[: i + 1]) for i in range(len(segments))
+        ]
+        ignored = False
+        for pattern in self.patterns:
+            if any(pattern.regex.match(path) for path in candidates):
+                ignored = not pattern.exclusion
+        return ignored
+
+
+def iter_source_files(source_dir: str) -> Iterator[Tuple[str, str]]:
+    """
+    Walk the source directory in a stable order, leaving out the paths its
+    ignore file matches.
+
+    Yields:
+        The path of every directory and file relative to source_dir, with
+        "/" as separator, and its path on disk
+
+    """
+    rules = IgnoreRules.from_dir(source_dir)
+    for root, dirs, files in os.walk(source_dir, followlinks=True):
+        dirs.sort()
+        kept_dirs = []
+        for name in dirs + sorted(files):
+            path = os.path.join(root, name)
+            relative_path = os.path.relpath(path, source_dir).replace(
+                os.sep, "/"
+            )
+            is_dir = name in dirs
+            if rules.ignored(relative_path):
+                # Only descend into ignored directories when a pattern may
+                # re-include something in them.
+                if is_dir and rules.has_exclusions:
+                    kept_dirs.append(name)
+                continue
+            if is_dir:
+                kept_dirs.append(name)
+            yield relative_path, path
+        dirs[:] = kept_dirs
+
+
+def tar_header(name: str, size: int, mode: int, mtime: float) -> bytes:
+    info = tarfile.TarInfo(name)
+    info.size = size
+    info.mode = stat.S_IMODE(mode)
+    info.mtime = int(mtime)
+    info.type = tarfile.DIRTYPE if stat.S_ISDIR(mode) else tarfile.REGTYPE
+    return info.tobuf(format=tarfile.PAX_FORMAT)
+
+
+def padding(size: int) -> bytes:
+    return b"\0" * (-size % BLOCK_SIZE)
+
+
+class ContextEntry(NamedTuple):
+    name: str
+    header: bytes
+    size: int
+    path: Optional[str] = None
+    data: Optional[bytes] = None
+
+
+def iter_context_entries(
+    source_dir: str, wrapper_files: Dict[str, str]
+) -> Iterator[ContextEntry]:
+    now = time.time()
+    for name, content in wrapper_files.items():
+        data = content.encode("utf-8")
+        header = tar_header(name, len(data), 0o100644, now)
+        yield ContextEntry(name, header, len(data), data=data)
+
+    for name, path in iter_source_files(source_dir):
+        if name in wrapper_files:
+            logger.warning(
+                f"Generated {name} replaces the file in {source_dir}"
+            )
+            continue
+        file_stat = os.stat(path)
+        size = 0 if stat.S_ISDIR(file_stat.st_mode) else file_stat.st_size
+        header = tar_header(name, size, file_stat.st_mode, file_stat.st_mtime)
+        yield ContextEntry(name, header, size, path=path)
+
+
+def stream_build_context(
+    source_dir: str, wrapper_files: Dict[str, str]
+) -> Iterator[bytes]:
+    """
+    Generate the build context as an uncompressed tar stream, holding the
+    wrapper files and the files of the source directory, which are read in
+    place.
+
+    Args:
+        source_dir (str): Directory with the model code
+        wrapper_files (Dict[str, str]): Rendered wrapper files by name. These
+            replace source files with the same name
+
+    Yields:
+        Chunks of the tar archive
+
+    """
+    for entry in iter_context_entries(source_dir, wrapper_files):
+        yield entry.header
+        if entry.data is not None:
+            yield entry.data
+        elif entry.path is not None and entry.size:
+            remaining = entry.size
+            with open(entry.path, "rb") as f:
+                while remaining:
+                    chunk = f.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        # The file shrunk while it was read, the header
+                        # already promised its original size.
+                        chunk = b"\0" * remaining
+                    remaining -= len(chunk)
+                    yield chunk
+        yield padding(entry.size)
+
+    # End of archive
+    yield b"\0" * (2 * BLOCK_SIZE)
+
+
+def get_context_size(
+    source_dir: str, wrapper_files: Dict[str, str]
+) -> Tuple[int, Dict[str, int]]:
+    """
+    Size of the build context without reading any file.
+
+    Returns:
+        The number of bytes sent to docker, and the number of bytes per top
+        level file or directory
+
+    """
+    total = 2 * BLOCK_SIZE
+    sizes: Dict[str, int] = {}
+    for entry in iter_context_entries(source_dir, wrapper_files):
+        entry_size = len(entry.header) + entry.size + len(padding(entry.size))
+        total += entry_size
+        top_level = entry.name.split("/")[0]
+        sizes[top_level] = sizes.get(top_level, 0) + entry_size
+    return total, sizes
@@ -1,15 +1,54 @@
-import os
+from typing import Dict
 
-from nervosum.config import NervosumConfig
-from nervosum.core import utils
-from nervosum.core.builders.image_builder import ImageBuilder, logger
+from nervosum.config import DataSourceField, NervosumConfig
+from nervosum.core import schema, utils
+from nervosum.core.builders.image_builder import ImageBuilder
+
+
+def get_format_options(field: DataSourceField) -> Dict[str, str]:
+    options = dict(field.options)
+    if field.format == "csv":
+        options.setdefault("header", "true")
+    return options
 
 
 class BatchImageBuilder(ImageBuilder):
     mode = "batch"
 
-    def generate_wrapper_files(self, config: NervosumConfig) -> None:
-        logger.info("Copying wrapper files")
+    def render_wrapper_files(self, config: NervosumConfig) -> Dict[str, str]:
+        source = config.deployment.source
+        output = config.deployment.output
+        spark = config.deployment.spark
+        input_fields = schema.compile_schema(config.input_schema)
+        output_fields = schema.compile_schema(
+            config.output_schema
+            if isinstance(config.output_schema, list)
+            else [config.output_schema]
+        )
+
+        passthrough_fields = []
+        for column in spark.passthrough_columns:
+            matches = [field for field in input_fields if field.name == column]
+            if not matches:
+                raise ValueError(
+                    f"Can not pass column {column} through, which is not an "
+                    "input column"
+                )
+            passthrough_fields.append(matches[0])
+
+        output_columns = [
+            field.name for field in passthrough_fields + output_fields
+        ]
+        for column in output.partition_by:
+            if column not in output_columns:
+                raise ValueError(
+                    f"Can not partition output by {column}, which is not an "
+                    "output column"
+                )
+
+        output_options = get_format_options(output)
+        if output.compression is not None:
+            output_options["compression"] = output.compression
 
         wrapper_requirements = utils.render_template(
             self.mode, "wrapper-requirements.txt"
@@ -21,6 +60,17 @@ class BatchImageBuilder(ImageBuilder):
             src=config.src.replace("/", ".").rstrip("."),
             model_module=config.interface.model_module,
             model_class=config.interface.model_class,
+            input_fields=input_fields,
+            source=source,
+            source_options=get_format_options(source),
+            output=output,
+            output_options=output_options,
+            output_fields=output_fields,
+            output_schema=schema.to_spark_ddl(
+                passthrough_fields + output_fields
+            ),
+            spark=spark,
+            dependencies=config.deployment.dependencies,
         )
 
         dockerfile = utils.render_template(
@@ -28,22 +78,23 @@ class BatchImageBuilder(ImageBuilder):
             "Dockerfile.j2",
             requirements_file=config.requirements,
             platform_tag=config.deployment.platform_tag,
+            source_format=source.format,
+            output_format=output.format,
+            dependencies=config.deployment.dependencies,
+            buildkit=self.buildkit,
         )
 
-        utils.write_to_file(
-            os.path.join(self.target_dir, "pydzipimport_linux.py"),
-            utils.get_pkg_file("batch", "pydzipimport_linux.py").decode(
-                "utf-8"
-            ),
-        )
-
-        utils.write_to_file(
-            os.path.join(self.target_dir, "wrapper.py"), wrapper_file
-        )
-        utils.write_to_file(
-            os.path.join(self.target_dir, "wrapper-requirements.txt"),
-            wrapper_requirements,
-        )
-        utils.write_to_file(
-            os.path.join(self.target_dir, "Dockerfile"), dockerfile
-        )
+        wrapper_files = {
+            "wrapper.py": wrapper_file,
+            "wrapper-requirements.txt": wrapper_requirements,
+            "Dockerfile": dockerfile,
+        }
+        static_files = ["model_registry.py"]
+        if config.deployment.dependencies == "zip":
+            # Only zipped dependencies need C extensions extracted on import
+            static_files.append("pydzipimport_linux.py")
+        for static_file in static_files:
+            wrapper_files[static_file] = utils.get_pkg_file(
+                self.mode, static_file
+            ).decode("utf-8")
+        return wrapper_files
@@ -1,18 +1,36 @@
-import os
+from typing import Dict
 
 from nervosum.config import NervosumConfig
-from nervosum.core import utils
-from nervosum.core.builders.image_builder import ImageBuilder, logger
+from nervosum.core import schema, utils
+from nervosum.core.builders.image_builder import ImageBuilder
 
 
 class FlaskImageBuilder(ImageBuilder):
     mode = "http"
 
-    def generate_wrapper_files(self, config: NervosumConfig) -> None:
-        logger.info("Copying wrapper files")
+    def render_wrapper_files(self, config: NervosumConfig) -> Dict[str, str]:
+        server = config.deployment.server
+        binary_formats = config.deployment.binary_formats
+        input_fields = schema.compile_schema(config.input_schema)
+        output_fields = schema.compile_schema(
+            config.output_schema
+            if isinstance(config.output_schema, list)
+            else [config.output_schema]
+        )
+
+        if "numpy" in binary_formats:
+            for field in input_fields + output_fields:
+                if field.dtype == "object":
+                    raise ValueError(
+                        f"Field {field.name} has no fixed width type, which "
+                        "numpy payloads require"
+                    )
 
         wrapper_requirements = utils.render_template(
-            self.mode, "wrapper-requirements.txt"
+            self.mode,
+            "wrapper-requirements.txt.j2",
+            server=server,
+            binary_formats=binary_formats,
         )
 
         wrapper_file = utils.render_template(
@@ -20,23 +38,33 @@ class FlaskImageBuilder(ImageBuilder):
             "wrapper.py.j2",
             model_module=config.interface.model_module,
             model_class=config.interface.model_class,
-            input_schema=config.input_schema,
+            input_schema=[field.dict() for field in config.input_schema],
+            input_fields=input_fields,
             output_schema=config.output_schema,
+            output_fields=output_fields,
             src=config.src.replace("/", ".").rstrip("."),
             metadata=None,
+            batching=config.deployment.batching,
+            cache=config.deployment.cache,
+            server=server,
+            binary_formats=binary_formats,
         )
 
         dockerfile = utils.render_template(
-            self.mode, "Dockerfile.j2", requirements_file=config.requirements,
+            self.mode,
+            "Dockerfile.j2",
+            requirements_file=config.requirements,
+            server=server,
+            buildkit=self.buildkit,
         )
 
-        utils.write_to_file(
-            os.path.join(self.target_dir, "wrapper.py"), wrapper_file
-        )
-        utils.write_to_file(
-            os.path.join(self.target_dir, "wrapper_requirements.txt"),
-            wrapper_requirements,
-        )
-        utils.write_to_file(
-            os.path.join(self.target_dir, "Dockerfile"), dockerfile
-        )
+        wrapper_files = {
+            "wrapper.py": wrapper_file,
+            "wrapper_requirements.txt": wrapper_requirements,
+            "Dockerfile": dockerfile,
+        }
+        if server.engine != "flask":
+            wrapper_files["gunicorn.conf.py"] = utils.render_template(
+                self.mode, "gunicorn.conf.py.j2", server=server
+            )
+        return wrapper_files
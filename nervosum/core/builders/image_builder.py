@@ -1,51 +1,224 @@
 import logging
 import os
+import sqlite3
+import subprocess
+import tempfile
+import threading
 from abc import ABC, abstractmethod
-
-import docker
+from typing import Dict, List, Optional
 
 from nervosum.config import NervosumConfig
-from nervosum.core import utils
+from nervosum.core import streaming, utils
+from nervosum.core.build_context import stream_build_context
+from nervosum.core.docker_client import get_client
+from nervosum.core.index import ImageIndex
 
 logger = logging.getLogger(__name__)
 
-client = docker.from_env()
-
 
 class ImageBuilder(ABC):
     mode: str
 
-    def __init__(self, source_dir: str, target_dir: str):
+    def __init__(
+        self,
+        source_dir: str,
+        target_dir: Optional[str] = None,
+        buildkit: bool = False,
+        prefix: str = "",
+    ):
         self.source_dir = source_dir
         self.target_dir = target_dir
+        self.buildkit = buildkit
+        # Starts every line of build output, to tell concurrent builds apart
+        self.prefix = prefix
 
     @abstractmethod
+    def render_wrapper_files(self, config: NervosumConfig) -> Dict[str, str]:
+        """
+        Render the files wrapping the model, by name relative to the build
+        directory.
+        """
+
     def generate_wrapper_files(self, config: NervosumConfig) -> None:
-        pass
+        self.write_wrapper_files(self.render_wrapper_files(config))
 
-    def copy_client_files_to_build_dir(self) -> None:
-        logger.info("Copying client files")
+    def write_wrapper_files(self, wrapper_files: Dict[str, str]) -> None:
+        if self.target_dir is None:
+            raise ValueError("No target directory to write wrapper files to")
+        logger.info("Copying wrapper files")
         utils.create_dir(self.target_dir, mode="skip")
-        utils.copy_contents_to_target_dir(self.source_dir, self.target_dir)
+        for file_name, content in wrapper_files.items():
+            utils.write_to_file(
+                os.path.join(self.target_dir, file_name), content
+            )
+
+    @staticmethod
+    def get_repository(config: NervosumConfig) -> str:
+        return f"nervosum/{config.name.lower()}"
+
+    def get_labels(self, config: NervosumConfig) -> Dict[str, Optional[str]]:
+        return {
+            "owner": "nervosum",
+            "mode": self.mode,
+            "name": config.name.lower(),
+            "tag": config.tag,
+        }
 
     def build_image(
-        self, config: NervosumConfig, silent: bool = False
-    ) -> None:
-        logger.info("Building docker image")
-
-        os.chdir(self.target_dir)
-        build_stream = client.api.build(
-            path=".",
-            labels={
-                "owner": "nervosum",
-                "mode": self.mode,
-                "name": config.name.lower(),
-                "tag": config.tag,
-            },
-            tag=[f"nervosum/{config.name.lower()}:{config.tag}"],
-            quiet=False,
-        )
-        if silent:
-            return
-
-        utils.print_build_stream(build_stream)
+        self,
+        config: NervosumConfig,
+        wrapper_files: Dict[str, str],
+        silent: bool = False,
+        cache_from: Optional[List[str]] = None,
+        cache_to: Optional[str] = None,
+    ) -> Optional[str]:
+        """
+        Build the image from the wrapper files and the source directory,
+        which are streamed to docker as build context without staging them
+        on disk.
+
+        Args:
+            cache_from (List[str], optional): Images, or BuildKit cache
+                sources, to reuse layers from
+            cache_to (str, optional): BuildKit cache destination to export
+                the layers of the build to
+
+        Returns:
+            The ID of the built image, or None when the build output is not
+            read
+
+        """
+        logger.info(f"{self.prefix}Building docker image")
+
+        if self.buildkit:
+            image_id = self.build_image_buildkit(
+                config, wrapper_files, silent, cache_from, cache_to
+            )
+        else:
+            if cache_to is not None:
+                logger.warning(
+                    f"{self.prefix}Ignoring cache-to, which requires BuildKit"
+                )
+
+            build_stream = get_client().api.build(
+                fileobj=stream_build_context(self.source_dir, wrapper_files),
+                custom_context=True,
+                labels=self.get_labels(config),
+                tag=[f"{self.get_repository(config)}:{config.tag}"],
+                cache_from=cache_from,
+                quiet=False,
+            )
+            if silent:
+                return None
+            image_id = streaming.print_build_stream(build_stream, self.prefix)
+
+        if image_id is not None:
+            self.index_image(image_id)
+        return image_id
+
+    def build_image_buildkit(
+        self,
+        config: NervosumConfig,
+        wrapper_files: Dict[str, str],
+        silent: bool = False,
+        cache_from: Optional[List[str]] = None,
+        cache_to: Optional[str] = None,
+    ) -> Optional[str]:
+        """
+        Build the image with `docker buildx`, which reads the build context
+        from stdin and loads the image into the local docker daemon.
+        """
+        with tempfile.TemporaryDirectory() as td:
+            iid_file = os.path.join(td, "iid")
+            command = [
+                "docker",
+                "buildx",
+                "build",
+                "--load",
+                "--iidfile",
+                iid_file,
+                "--tag",
+                f"{self.get_repository(config)}:{config.tag}",
+            ]
+            for key, value in self.get_labels(config).items():
+                if value is not None:
+                    command += ["--label", f"{key}={value}"]
+            for source in cache_from or []:
+                command += ["--cache-from", source]
+            if cache_to is not None:
+                command += ["--cache-to", cache_to]
+            command.append("-")
+
+            if silent:
+                stdout, stderr = subprocess.DEVNULL, subprocess.DEVNULL
+            elif self.prefix:
+                stdout, stderr = subprocess.PIPE, subprocess.STDOUT
+            else:
+                # Leave the terminal to buildx, which renders its progress
+                stdout, stderr = None, None
+            process = subprocess.Popen(
+                command, stdin=subprocess.PIPE, stdout=stdout, stderr=stderr
+            )
+            stdin = process.stdin
+            assert stdin is not None
+            reader = None
+            if process.stdout is not None:
+                lines = (
+                    line.decode("utf-8", "replace") for line in process.stdout
+                )
+                reader = threading.Thread(
+                    target=streaming.print_lines, args=(lines, self.prefix)
+                )
+                reader.start()
+            try:
+                for chunk in stream_build_context(
+                    self.source_dir, wrapper_files
+                ):
+                    stdin.write(chunk)
+            except BrokenPipeError:
+                # The build failed before reading the whole context, its
+                # exit code tells why.
+                pass
+            finally:
+                try:
+                    stdin.close()
+                except BrokenPipeError:
+                    pass
+            if reader is not None:
+                reader.join()
+            if process.wait() != 0:
+                logger.error(f"{self.prefix}docker buildx build failed")
+                return None
+            with open(iid_file) as f:
+                return f.read().strip()
+
+    def tag_image(self, config: NervosumConfig, image_id: str) -> bool:
+        """
+        Tag a previously built image as the image of config.
+
+        Returns:
+            Whether the image still exists and was tagged
+
+        """
+        from docker.errors import NotFound
+
+        try:
+            tagged = get_client().api.tag(
+                image_id, self.get_repository(config), tag=config.tag
+            )
+        except NotFound:
+            return False
+        if tagged:
+            self.index_image(image_id)
+        return tagged
+
+    def index_image(self, image_id: str) -> None:
+        """
+        Record the image in the local image index, such that it is found
+        without waiting for the next sync with the daemon.
+        """
+        try:
+            with ImageIndex() as index:
+                index.refresh(image_id)
+        except sqlite3.Error as e:
+            logger.warning(f"{self.prefix}Could not index {image_id}: {e}")
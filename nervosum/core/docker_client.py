@@ -0,0 +1,23 @@
+import threading
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from docker import DockerClient
+
+_client: Optional["DockerClient"] = None
+_lock = threading.Lock()
+
+
+def get_client() -> "DockerClient":
+    """
+    The docker client shared by all commands. It is created on first use,
+    such that commands not talking to the daemon, and `--help`, neither
+    import docker nor look up the daemon.
+    """
+    global _client
+    with _lock:
+        if _client is None:
+            import docker
+
+            _client = docker.from_env()
+        return _client
@@ -0,0 +1,335 @@
+import json
+import logging
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set
+
+from nervosum.core import utils
+from nervosum.core.docker_client import get_client
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.db"
+# Labels stored in their own, indexed, columns
+INDEXED_LABELS = ["name", "tag", "mode"]
+# The daemon keeps a limited number of events in memory. Rebuild the index
+# from scratch when it was not synced for a while, rather than trusting the
+# events to be complete.
+FULL_SYNC_SECONDS = 3600
+# Events are read again from slightly before the last sync, which is
+# harmless as applying them is idempotent, to allow for clock skew.
+SYNC_OVERLAP_SECONDS = 5
+
+
+class ImageRecord(NamedTuple):
+    id: str
+    name: Optional[str]
+    tag: Optional[str]
+    mode: Optional[str]
+    created: int
+    labels: Dict[str, str]
+
+    @property
+    def short_id(self) -> str:
+        return self.id.split(":")[-1][:12]
+
+    @classmethod
+    def from_summary(cls, summary: Dict[str, Any]) -> "ImageRecord":
+        """Record of an image as listed by the docker images endpoint."""
+        return cls.from_labels(
+            summary["Id"], summary["Created"], summary.get("Labels")
+        )
+
+    @classmethod
+    def from_inspect(cls, attrs: Dict[str, Any]) -> "ImageRecord":
+        """Record of an image as returned by docker image inspect."""
+        # Created is an RFC 3339 timestamp in UTC, e.g.
+        # "2020-01-01T00:00:00.123456789Z", of which whole seconds are kept.
+        created = datetime.strptime(attrs["Created"][:19], "%Y-%m-%dT%H:%M:%S")
+        return cls.from_labels(
+            attrs["Id"],
+            int(created.replace(tzinfo=timezone.utc).timestamp()),
+            (attrs.get("Config") or {}).get("Labels"),
+        )
+
+    @classmethod
+    def from_labels(
+        cls, image_id: str, created: int, labels: Optional[Dict[str, str]]
+    ) -> "ImageRecord":
+        labels = labels or {}
+        return cls(
+            id=image_id,
+            name=labels.get("name"),
+            tag=labels.get("tag"),
+            mode=labels.get("mode"),
+            created=created,
+            labels=labels,
+        )
+
+
+class ImageFilter(NamedTuple):
+    key: str
+    value: str
+    prefix: bool
+
+    @classmethod
+    def parse(cls, a_filter: str) -> "ImageFilter":
+        """
+        Parse `key=value`, matching the value exactly, or `key=value*`,
+        matching values starting with value. Image ids always match by
+        prefix.
+        """
+        if "=" not in a_filter:
+            raise ValueError(
+                f"Invalid filter {a_filter}, expected key=value or "
+                "key=value*"
+            )
+        key, value = a_filter.split("=", 1)
+        prefix = value.endswith("*") or key == "id"
+        return cls(key, value.rstrip("*"), prefix)
+
+    def matches(self, record: ImageRecord) -> bool:
+        if self.key == "id":
+            return record.id.split(":")[-1].startswith(
+                self.value.split(":")[-1]
+            )
+        label = record.labels.get(self.key)
+        if label is None:
+            return False
+        if self.prefix:
+            return label.startswith(self.value)
+        return label == self.value
+
+
+def prefix_upper_bound(prefix: str) -> Optional[str]:
+    """
+    Smallest string greater than every string starting with prefix, or None
+    when there is none. SQLite compares text by its UTF-8 bytes, which
+    orders strings by code point like Python does.
+    """
+    while prefix:
+        last = ord(prefix[-1]) + 1
+        # Surrogates are not valid in UTF-8
+        if 0xD800 <= last <= 0xDFFF:
+            last = 0xE000
+        if last <= sys.maxunicode:
+            return prefix[:-1] + chr(last)
+        prefix = prefix[:-1]
+    return None
+
+
+def is_nervosum_image(attrs: Dict[str, Any]) -> bool:
+    return any(
+        tag.startswith("nervosum/") for tag in attrs.get("RepoTags") or []
+    )
+
+
+class ImageIndex:
+    """
+    Local SQLite index of nervosum images, such that finding the latest
+    image with a name or tag is an indexed lookup rather than a scan of all
+    images known to the daemon. The index is kept up to date by the
+    builders and by replaying the image events of the daemon.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(utils.get_nervosum_dir(), INDEX_FILE)
+        self.connection = sqlite3.connect(self.path, timeout=30)
+        with self.connection:
+            self.connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS images (
+                    id TEXT PRIMARY KEY,
+                    name TEXT,
+                    tag TEXT,
+                    mode TEXT,
+                    created INTEGER NOT NULL,
+                    labels TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS images_name
+                    ON images (name, tag, created);
+                CREATE INDEX IF NOT EXISTS images_tag
+                    ON images (tag, created);
+                CREATE INDEX IF NOT EXISTS images_mode
+                    ON images (mode, created);
+                CREATE INDEX IF NOT EXISTS images_created
+                    ON images (created);
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                );
+                """
+            )
+
+    def __enter__(self) -> "ImageIndex":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def add(self, record: ImageRecord) -> None:
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    record.id,
+                    record.name,
+                    record.tag,
+                    record.mode,
+                    record.created,
+                    json.dumps(record.labels),
+                ),
+            )
+
+    def remove(self, image_id: str) -> None:
+        with self.connection:
+            self.connection.execute(
+                "DELETE FROM images WHERE id = ?", (image_id,)
+            )
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self.connection.execute(
+            "SELECT value FROM meta WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value)
+            )
+
+    def get_last_sync(self) -> Optional[int]:
+        last_sync = self.get_meta("last_sync")
+        return int(last_sync) if last_sync is not None else None
+
+    def set_last_sync(self, last_sync: int) -> None:
+        self.set_meta("last_sync", str(last_sync))
+
+    def rebuild(self, daemon_id: Optional[str] = None) -> None:
+        """
+        Replace the index by the nervosum images the daemon lists, and
+        remember which daemon it lists the images of.
+        """
+        now = int(time.time())
+        api = get_client().api
+        if daemon_id is None:
+            daemon_id = api.info()["ID"]
+        summaries = api.images(filters={"reference": "nervosum/*"})
+        with self.connection:
+            self.connection.execute("DELETE FROM images")
+        for summary in summaries:
+            self.add(ImageRecord.from_summary(summary))
+        self.set_meta("daemon_id", daemon_id)
+        self.set_last_sync(now)
+
+    def refresh(self, image_id: str) -> None:
+        """Update the record of one image from the daemon."""
+        from docker.errors import NotFound
+
+        try:
+            attrs = get_client().api.inspect_image(image_id)
+        except NotFound:
+            self.remove(image_id)
+            return
+        if is_nervosum_image(attrs):
+            self.add(ImageRecord.from_inspect(attrs))
+        else:
+            self.remove(attrs["Id"])
+
+    def sync(self) -> None:
+        """
+        Apply the image events since the last sync, or rebuild the index
+        when it was never or not recently synced, or when DOCKER_HOST now
+        points at another daemon than the one it was synced with.
+        """
+        api = get_client().api
+        daemon_id = api.info()["ID"]
+        last_sync = self.get_last_sync()
+        now = int(time.time())
+        if (
+            last_sync is None
+            or now - last_sync > FULL_SYNC_SECONDS
+            or self.get_meta("daemon_id") != daemon_id
+        ):
+            logger.debug("Rebuilding the image index")
+            self.rebuild(daemon_id)
+            return
+
+        image_ids: Set[str] = set()
+        events = api.events(
+            since=last_sync - SYNC_OVERLAP_SECONDS,
+            until=now,
+            filters={"type": "image"},
+            decode=True,
+        )
+        for event in events:
+            image_id = event.get("id") or event.get("Actor", {}).get("ID")
+            if image_id:
+                image_ids.add(image_id)
+        for image_id in image_ids:
+            self.refresh(image_id)
+        self.set_last_sync(now)
+
+    def query(
+        self, filters: Iterable[ImageFilter] = (), limit: Optional[int] = None
+    ) -> List[ImageRecord]:
+        """
+        Records matching all filters, most recently created first. Filters
+        on the id and on indexed labels are answered from the indexes.
+        """
+        conditions: List[str] = []
+        parameters: List[Any] = []
+        remaining: List[ImageFilter] = []
+        for f in filters:
+            if f.key == "id" or f.key in INDEXED_LABELS:
+                column = f.key
+                value = f.value
+                if f.key == "id":
+                    value = "sha256:" + value.split(":")[-1]
+                if f.prefix:
+                    # A range rather than LIKE, which ignores case and can
+                    # not use the indexes.
+                    upper = prefix_upper_bound(value)
+                    conditions.append(f"{column} >= ?")
+                    parameters.append(value)
+                    if upper is not None:
+                        conditions.append(f"{column} < ?")
+                        parameters.append(upper)
+                else:
+                    conditions.append(f"{column} = ?")
+                    parameters.append(value)
+            else:
+                remaining.append(f)
+
+        sql = "SELECT id, name, tag, mode, created, labels FROM images"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY created DESC"
+        if limit is not None and not remaining:
+            sql += " LIMIT ?"
+            parameters.append(limit)
+
+        records = []
+        for row in self.connection.execute(sql, parameters):
+            image_id, name, tag, mode, created, labels = row
+            record = ImageRecord(
+                image_id, name, tag, mode, created, json.loads(labels)
+            )
+            if all(f.matches(record) for f in remaining):
+                records.append(record)
+                if limit is not None and len(records) >= limit:
+                    break
+        return records
+
+    def latest(
+        self, filters: Iterable[ImageFilter] = ()
+    ) -> Optional[ImageRecord]:
+        records = self.query(filters, limit=1)
+        return records[0] if records else None
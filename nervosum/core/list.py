@@ -1,67 +1,63 @@
 import argparse
+import json
 import logging
 from datetime import datetime
-from typing import Iterator, List, Optional, Union
+from typing import List, Optional
 
-import docker
-import timeago
-from dateutil import parser as datetime_parser
-from docker.models.images import Image
+from nervosum.core.index import ImageFilter, ImageIndex, ImageRecord
 
 logger = logging.getLogger(__name__)
 logger.addHandler(logging.StreamHandler())
 logger.setLevel("DEBUG")
 
-client = docker.from_env()
 
+def get_images(
+    filters: Optional[List[str]] = None, limit: Optional[int] = None
+) -> List[ImageRecord]:
+    """
+    Nervosum images matching all filters, most recently created first, as
+    found in the local image index after syncing it with the daemon.
+    """
+    image_filters = [ImageFilter.parse(a_filter) for a_filter in filters or []]
+    with ImageIndex() as index:
+        index.sync()
+        return index.query(image_filters, limit)
 
-def get_nervosum_images() -> Iterator[Image]:
-    return iter(client.images.list(filters={"reference": "nervosum/*"}))
 
+def format_images_table(images: List[ImageRecord]) -> str:
+    import timeago
 
-def pretty_print_images(images: Iterator[Image]) -> None:
     now = datetime.utcnow()
-    print(f"{'TAG':15s}{'NAME':15s}{'CREATED':20s}LABELS")
+    lines = [f"{'TAG':15s}{'NAME':15s}{'CREATED':20s}LABELS"]
     for image in images:
-        time_last_run = datetime_parser.parse(image.attrs["Created"]).replace(
-            tzinfo=None
-        )
-        time_since_last_run = timeago.format(time_last_run, now)
-
+        created = datetime.utcfromtimestamp(image.created)
         labels = ", ".join(f"{k}='{v}'" for k, v in image.labels.items())
-        print(
-            f"{image.short_id[7:]:15s}{image.labels.get('name'):15s}"
-            f"{time_since_last_run:20s}{labels}"
+        lines.append(
+            f"{image.short_id:15s}{image.name or '':15s}"
+            f"{timeago.format(created, now):20s}{labels}"
         )
+    return "\n".join(lines)
 
 
-def filter_images(
-    images: Iterator[Image], filters: Union[List[str], str]
-) -> Iterator[Image]:
-
-    if not isinstance(filters, list):
-        filters = list(filters)
-
-    for a_filter in filters:
-        k, v = a_filter.split("=")
-        if k == "id":
-            images = filter(lambda image: v in image.id, images,)
-        else:
-            images = filter(lambda image: v in image.labels.get(k), images)
-    return images
-
-
-def get_images(
-    filters: Optional[Union[List[str], str]] = None
-) -> Iterator[Image]:
-    images = get_nervosum_images()
-    if filters is not None:
-        images = filter_images(images, filters)
-    return images
+def format_images_json(images: List[ImageRecord]) -> str:
+    return json.dumps(
+        [
+            {
+                **image._asdict(),
+                "short_id": image.short_id,
+                "created": datetime.utcfromtimestamp(image.created).isoformat()
+                + "Z",
+            }
+            for image in images
+        ],
+        indent=2,
+    )
 
 
 def execute(args: argparse.Namespace) -> None:
-    images = get_nervosum_images()
-    if args.filter:
-        images = filter_images(images, args.filter)
-    pretty_print_images(images)
+    images = get_images(args.filter, args.limit)
+
+    if args.format == "json":
+        print(format_images_json(images))
+    else:
+        print(format_images_table(images))
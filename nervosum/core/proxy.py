@@ -0,0 +1,158 @@
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES = ["round-robin", "least-connections"]
+BUFFER_SIZE = 1 << 16
+
+
+class Backend:
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        # Number of connections currently proxied to this backend
+        self.connections = 0
+
+    def __repr__(self) -> str:
+        return f"{self.host}:{self.port}"
+
+
+class LoadBalancer:
+    """
+    Picks the backend for every new connection, either in turn
+    (round-robin) or the one with the fewest open connections
+    (least-connections), taking turns between equally loaded backends.
+    """
+
+    def __init__(self, backends: List[Backend], strategy: str = "round-robin"):
+        if not backends:
+            raise ValueError("At least one backend is required")
+        if strategy not in STRATEGIES:
+            raise ValueError(
+                f"Unknown strategy {strategy}, expected one of {STRATEGIES}"
+            )
+        self.backends = backends
+        self.strategy = strategy
+        self.next = 0
+
+    def choose(self, exclude: Optional[List[Backend]] = None) -> Backend:
+        count = len(self.backends)
+        # All backends in turn, starting after the previous choice
+        in_turn = [
+            self.backends[(self.next + i) % count] for i in range(count)
+        ]
+        candidates = [b for b in in_turn if b not in (exclude or [])]
+        candidates = candidates or in_turn
+        if self.strategy == "least-connections":
+            backend = min(candidates, key=lambda b: b.connections)
+        else:
+            backend = candidates[0]
+        self.next = self.backends.index(backend) + 1
+        return backend
+
+
+async def pipe(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+) -> None:
+    try:
+        while True:
+            data = await reader.read(BUFFER_SIZE)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        # Pass on the end of the stream, the other direction may still be
+        # sending.
+        if writer.can_write_eof() and not writer.is_closing():
+            try:
+                writer.write_eof()
+            except OSError:
+                pass
+
+
+class TCPProxy:
+    """
+    Lightweight reverse proxy forwarding every connection to one of the
+    backends. Balancing happens per connection, so all requests sent over
+    one keep-alive connection reach the same backend.
+    """
+
+    def __init__(
+        self,
+        balancer: LoadBalancer,
+        host: str = "127.0.0.1",
+        port: int = 5000,
+    ):
+        self.balancer = balancer
+        self.host = host
+        self.port = port
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> int:
+        """
+        Start accepting connections.
+
+        Returns:
+            The port listened on, which is assigned by the OS when port is 0
+
+        """
+        self.server = await asyncio.start_server(
+            self.handle, self.host, self.port
+        )
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def connect(
+        self,
+    ) -> Optional[Tuple[Backend, asyncio.StreamReader, asyncio.StreamWriter]]:
+        """
+        Connect to a backend, trying the others when it refuses.
+
+        Returns:
+            The backend and its reader and writer, or None when no backend
+            accepts the connection
+
+        """
+        tried: List[Backend] = []
+        while len(tried) < len(self.balancer.backends):
+            backend = self.balancer.choose(exclude=tried)
+            try:
+                reader, writer = await asyncio.open_connection(
+                    backend.host, backend.port
+                )
+            except OSError as e:
+                logger.warning(f"Could not connect to {backend}: {e}")
+                tried.append(backend)
+                continue
+            return backend, reader, writer
+        return None
+
+    async def handle(
+        self,
+        client_reader: asyncio.StreamReader,
+        client_writer: asyncio.StreamWriter,
+    ) -> None:
+        connection = await self.connect()
+        if connection is None:
+            client_writer.close()
+            return
+        backend, backend_reader, backend_writer = connection
+        backend.connections += 1
+        try:
+            await asyncio.gather(
+                pipe(client_reader, backend_writer),
+                pipe(backend_reader, client_writer),
+            )
+        finally:
+            backend.connections -= 1
+            backend_writer.close()
+            client_writer.close()
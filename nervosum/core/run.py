@@ -1,50 +1,173 @@
 import argparse
+import asyncio
 import logging
 import signal
 import sys
-from typing import Any, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, List
 
-import docker
-from dateutil import parser as datetime_parser
-from docker.models.containers import Container
-from docker.models.images import Image
+from nervosum.core import streaming
+from nervosum.core.docker_client import get_client
+from nervosum.core.index import ImageRecord
+from nervosum.core.list import get_images
+from nervosum.core.proxy import Backend, LoadBalancer, TCPProxy
 
-from nervosum.core import utils
-from nervosum.core.list import filter_images, get_images
+if TYPE_CHECKING:
+    from docker.models.containers import Container
 
 logger = logging.getLogger(__name__)
 logger.addHandler(logging.StreamHandler())
 logger.setLevel("DEBUG")
 
-client = docker.from_env()
+CONTAINER_PORT = "5000/tcp"
 
 
-def execute(args: argparse.Namespace) -> None:
-    conf = {}
-
-    images = get_images()
-
+def select_image(args: argparse.Namespace) -> ImageRecord:
+    """Most recently created image with the name and tag in args."""
+    filters = []
     if args.name:
-        images = filter_images(images, [f"name={args.name}"])
+        filters.append(f"name={args.name}")
 
     if args.tag:
-        images = filter_images(images, [f"tag={args.tag}"])
+        filters.append(f"tag={args.tag}")
     else:
         logger.warning("No container name given, running latest image.")
 
-    latest_image = filter_latest_image(images)
+    images = get_images(filters, limit=1)
+    if not images:
+        logger.error("No image found.")
+        sys.exit(1)
+    return images[0]
+
+
+def execute(args: argparse.Namespace) -> None:
+    latest_image = select_image(args)
+
+    if args.replicas > 1:
+        if latest_image.mode != "http":
+            logger.error("Only http images can run several replicas.")
+            sys.exit(1)
+        containers = start_replicas(latest_image, args)
+        asyncio.run(serve_replicas(containers, args))
+        return
 
-    if latest_image.labels["mode"] == "http":
-        conf["ports"] = {"5000/tcp": 5000}
+    conf = get_resource_limits(args)
+    if latest_image.mode == "http":
+        conf["ports"] = {CONTAINER_PORT: args.port}
 
     logger.info(f"Running image {latest_image.short_id}")
 
-    container = client.containers.run(latest_image, detach=True, **conf)
+    container = get_client().containers.run(
+        latest_image.id, detach=True, **conf
+    )
     add_kill_signal(container)
-    utils.print_container_stream(container.attach(stdout=True, stream=True))
+    if latest_image.mode == "http":
+        # With port 0, the port docker assigned is only known after
+        # inspecting the container again
+        container.reload()
+        logger.info(f"Serving on http://127.0.0.1:{get_host_port(container)}")
+    streaming.print_stream(container.attach(stdout=True, stream=True))
+
+
+def get_resource_limits(args: argparse.Namespace) -> Dict[str, Any]:
+    """Keyword arguments of containers.run limiting cpu and memory."""
+    limits: Dict[str, Any] = {}
+    if args.cpus is not None:
+        limits["nano_cpus"] = int(args.cpus * 1e9)
+    if args.memory is not None:
+        limits["mem_limit"] = args.memory
+    return limits
+
+
+def start_replicas(
+    image: ImageRecord, args: argparse.Namespace
+) -> List["Container"]:
+    """
+    Start the replicas of an http image, each published on a port of the
+    loopback interface which docker assigns.
+    """
+    logger.info(f"Running {args.replicas} replicas of image {image.short_id}")
+    containers = []
+    try:
+        for _ in range(args.replicas):
+            container = get_client().containers.run(
+                image.id,
+                detach=True,
+                ports={CONTAINER_PORT: ("127.0.0.1", None)},
+                **get_resource_limits(args),
+            )
+            containers.append(container)
+            # The assigned port is only known after inspecting it again
+            container.reload()
+    except BaseException:
+        stop_containers(containers)
+        raise
+    return containers
+
+
+def get_host_port(container: "Container") -> int:
+    return int(container.ports[CONTAINER_PORT][0]["HostPort"])
+
+
+def stop_containers(containers: List["Container"]) -> None:
+    with ThreadPoolExecutor(max_workers=max(1, len(containers))) as pool:
+        list(pool.map(lambda c: c.stop(timeout=0), containers))
+
+
+async def serve_replicas(
+    containers: List["Container"], args: argparse.Namespace
+) -> None:
+    """
+    Balance connections to args.port across the replicas and print their
+    output, until interrupted or until all replicas exited. All replicas are
+    stopped together.
+    """
+    loop = asyncio.get_running_loop()
+    # Every replica's output blocks a thread while waiting for more
+    loop.set_default_executor(ThreadPoolExecutor(len(containers) + 4))
+
+    backends = [Backend("127.0.0.1", get_host_port(c)) for c in containers]
+    proxy = TCPProxy(LoadBalancer(backends, args.balance), port=args.port)
+    outputs = [
+        asyncio.ensure_future(
+            streaming.aprint_stream(
+                streaming.aiter_blocking(
+                    container.attach(stdout=True, stream=True)
+                ),
+                prefix=f"[replica {i}] ",
+            )
+        )
+        for i, container in enumerate(containers, 1)
+    ]
+    stopped = asyncio.Event()
+    loop.add_signal_handler(signal.SIGINT, stopped.set)
+    interrupted = asyncio.ensure_future(stopped.wait())
+    exited = asyncio.ensure_future(asyncio.wait(outputs))
+    try:
+        port = await proxy.start()
+        for i, backend in enumerate(backends, 1):
+            logger.info(f"Replica {i} listens on {backend}")
+        logger.info(
+            f"Balancing ({args.balance}) http://127.0.0.1:{port} across "
+            f"{len(containers)} replicas"
+        )
+        await asyncio.wait(
+            [interrupted, exited], return_when=asyncio.FIRST_COMPLETED
+        )
+        if exited.done():
+            logger.info("All replicas exited")
+    finally:
+        loop.remove_signal_handler(signal.SIGINT)
+        interrupted.cancel()
+        logger.info("\rStopping containers...")
+        await proxy.close()
+        await loop.run_in_executor(None, stop_containers, containers)
+        await asyncio.gather(*outputs, return_exceptions=True)
+        await exited
+        logger.info("Done")
 
 
-def add_kill_signal(container: Container):
+def add_kill_signal(container: "Container"):
     def signal_handler(*args: Any, **kwargs: Any) -> None:
         logger.info("\rStopping container...")
         container.stop(timeout=0)
@@ -52,10 +175,3 @@ def add_kill_signal(container: Container):
         sys.exit(0)
 
     signal.signal(signal.SIGINT, signal_handler)
-
-
-def filter_latest_image(images: Iterator[Image]) -> Image:
-    latest_image = max(
-        images, key=lambda x: datetime_parser.parse(x.attrs["Created"])
-    )
-    return latest_image
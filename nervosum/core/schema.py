@@ -0,0 +1,76 @@
+from typing import List, NamedTuple, Tuple
+
+from nervosum.config import SchemaField
+
+
+class FieldType(NamedTuple):
+    dtype: str
+    python_types: Tuple[str, ...]
+    spark_type: str
+
+
+class CompiledField(NamedTuple):
+    name: str
+    dtype: str
+    python_types: Tuple[str, ...]
+    spark_type: str
+
+
+FIELD_TYPES = {
+    "int": FieldType(
+        dtype="int64", python_types=("int",), spark_type="bigint"
+    ),
+    "float": FieldType(
+        dtype="float64", python_types=("int", "float"), spark_type="double"
+    ),
+    "str": FieldType(
+        dtype="object", python_types=("str",), spark_type="string"
+    ),
+    "bool": FieldType(
+        dtype="bool", python_types=("bool",), spark_type="boolean"
+    ),
+}
+
+# Types nervosum does not know are passed through without validation.
+UNKNOWN_FIELD_TYPE = FieldType(
+    dtype="object", python_types=(), spark_type="string"
+)
+
+
+def get_field_type(type_name: str) -> FieldType:
+    return FIELD_TYPES.get(type_name.lower(), UNKNOWN_FIELD_TYPE)
+
+
+def compile_schema(fields: List[SchemaField]) -> List[CompiledField]:
+    """
+    Resolve the declared type of every field in a schema ahead of time, such
+    that generated wrappers can decode requests without inferring types.
+
+    Args:
+        fields (List[SchemaField]): The schema as declared in the config
+
+    Returns:
+        A list with the name, numpy dtype, accepted json value types and
+        Spark SQL type of every field
+
+    """
+    compiled = []
+    for field in fields:
+        field_type = get_field_type(field.type)
+        compiled.append(
+            CompiledField(
+                name=field.name,
+                dtype=field_type.dtype,
+                python_types=field_type.python_types,
+                spark_type=field_type.spark_type,
+            )
+        )
+    return compiled
+
+
+def to_spark_ddl(fields: List[CompiledField]) -> str:
+    """
+    Render compiled fields as a Spark DDL schema string, e.g.
+    "`id` bigint, `score` double".
+    """
+    return ", ".join(f"`{field.name}` {field.spark_type}" for field in fields)
@@ -0,0 +1,413 @@
+import asyncio
+import codecs
+import json
+import logging
+import queue
+import re
+import sys
+import threading
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    TextIO,
+    TypeVar,
+    cast,
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+NON_WHITESPACE = re.compile(r"\S")
+STEP = re.compile(r"Step (\d+)/(\d+) : ")
+CACHE_HIT = "---> Using cache"
+
+# Held while writing to the terminal, such that the output of concurrent
+# builds does not interleave within a line.
+print_lock = threading.Lock()
+
+
+class JSONStreamDecoder:
+    """
+    Incremental decoder of a stream of JSON documents, such as the output of
+    the docker API. Chunks are not required to end at the boundary of a
+    document, or of a multi-byte character.
+    """
+
+    def __init__(self) -> None:
+        self.text = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+
+    def feed(self, data: bytes, final: bool = False) -> List[Any]:
+        """
+        Returns:
+            The documents completed by data
+
+        """
+        self.buffer += self.text.decode(data, final)
+        documents = []
+        position = 0
+        while True:
+            start = NON_WHITESPACE.search(self.buffer, position)
+            if start is None:
+                position = len(self.buffer)
+                break
+            position = start.start()
+            try:
+                document, position = self.decoder.raw_decode(
+                    self.buffer, position
+                )
+            except ValueError:
+                # Documents never span lines, so the document is only
+                # incomplete when no line break follows.
+                end = self.buffer.find("\n", position)
+                if end == -1:
+                    break
+                logger.warning(
+                    f"Skipping invalid JSON {self.buffer[position:end]!r}"
+                )
+                position = end + 1
+                continue
+            documents.append(document)
+        self.buffer = self.buffer[position:]
+        return documents
+
+    def close(self) -> List[Any]:
+        documents = self.feed(b"", final=True)
+        if self.buffer.strip():
+            logger.warning(
+                f"Stream ended within the JSON document {self.buffer!r}"
+            )
+        self.buffer = ""
+        return documents
+
+
+class TextStreamDecoder:
+    """Incremental UTF-8 decoder of a stream of bytes."""
+
+    def __init__(self) -> None:
+        self.text = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    def feed(self, data: bytes) -> str:
+        return self.text.decode(data)
+
+    def close(self) -> str:
+        return self.text.decode(b"", True)
+
+
+class BuildEvent(NamedTuple):
+    """
+    A line of the output of a docker build, or its result. Kind is one of:
+
+    - step: start of step `step` out of `total`
+    - cache_hit: the current step reuses a cached layer
+    - output: any other line of output
+    - error: the build failed, text holds the error
+    - image: the build succeeded, text holds the ID of the image
+    """
+
+    kind: str
+    text: str
+    step: Optional[int] = None
+    total: Optional[int] = None
+
+
+class BuildEventParser:
+    """
+    Turns the messages of the docker build endpoint into build events.
+    Output lines split across messages are joined.
+    """
+
+    def __init__(self) -> None:
+        self.partial = ""
+        self.step: Optional[int] = None
+        self.total: Optional[int] = None
+
+    def event(self, kind: str, text: str) -> BuildEvent:
+        return BuildEvent(kind, text, self.step, self.total)
+
+    def parse_line(self, line: str) -> BuildEvent:
+        match = STEP.match(line)
+        if match:
+            self.step, self.total = int(match.group(1)), int(match.group(2))
+            return self.event("step", line)
+        if line.strip() == CACHE_HIT:
+            return self.event("cache_hit", line)
+        return self.event("output", line)
+
+    def feed(self, message: Dict[str, Any]) -> List[BuildEvent]:
+        if "stream" in message:
+            self.partial += message["stream"]
+            *lines, self.partial = self.partial.split("\n")
+            return [self.parse_line(line) for line in lines]
+        if "error" in message:
+            return [self.event("error", message["error"].rstrip("\n"))]
+        aux = message.get("aux")
+        if isinstance(aux, dict) and "ID" in aux:
+            return [self.event("image", aux["ID"])]
+        return []
+
+    def close(self) -> List[BuildEvent]:
+        events = [self.parse_line(self.partial)] if self.partial else []
+        self.partial = ""
+        return events
+
+
+def iter_json(chunks: Iterable[bytes]) -> Iterator[Any]:
+    decoder = JSONStreamDecoder()
+    for chunk in chunks:
+        yield from decoder.feed(chunk)
+    yield from decoder.close()
+
+
+def iter_text(chunks: Iterable[bytes]) -> Iterator[str]:
+    decoder = TextStreamDecoder()
+    for chunk in chunks:
+        yield decoder.feed(chunk)
+    yield decoder.close()
+
+
+def iter_build_events(chunks: Iterable[bytes]) -> Iterator[BuildEvent]:
+    parser = BuildEventParser()
+    for message in iter_json(chunks):
+        yield from parser.feed(message)
+    yield from parser.close()
+
+
+async def aiter_json(chunks: AsyncIterable[bytes]) -> AsyncIterator[Any]:
+    decoder = JSONStreamDecoder()
+    async for chunk in chunks:
+        for document in decoder.feed(chunk):
+            yield document
+    for document in decoder.close():
+        yield document
+
+
+async def aiter_text(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    decoder = TextStreamDecoder()
+    async for chunk in chunks:
+        yield decoder.feed(chunk)
+    yield decoder.close()
+
+
+async def aiter_build_events(
+    chunks: AsyncIterable[bytes],
+) -> AsyncIterator[BuildEvent]:
+    parser = BuildEventParser()
+    async for message in aiter_json(chunks):
+        for event in parser.feed(message):
+            yield event
+    for event in parser.close():
+        yield event
+
+
+class _Failure(NamedTuple):
+    error: Exception
+
+
+_DONE = object()
+
+
+async def aiter_blocking(iterable: Iterable[T]) -> AsyncIterator[T]:
+    """
+    Iterate a blocking iterable, such as a docker stream, in the default
+    executor of the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    iterator = iter(iterable)
+    while True:
+        item = await loop.run_in_executor(None, next, iterator, _DONE)
+        if item is _DONE:
+            return
+        yield cast(T, item)
+
+
+def iter_batches(iterable: Iterable[T]) -> Iterator[List[T]]:
+    """
+    Read the iterable in a background thread, and yield everything that
+    arrived since the previous batch. A fast producer is consumed in large
+    batches, while the items of a slow one are passed on as they arrive.
+    """
+    items: queue.Queue = queue.Queue()
+
+    def read() -> None:
+        try:
+            for item in iterable:
+                items.put(item)
+        except Exception as e:
+            items.put(_Failure(e))
+        finally:
+            items.put(_DONE)
+
+    threading.Thread(target=read, daemon=True).start()
+    while True:
+        batch = [items.get()]
+        while True:
+            try:
+                batch.append(items.get_nowait())
+            except queue.Empty:
+                break
+        ready: List[T] = []
+        for item in batch:
+            if item is _DONE or isinstance(item, _Failure):
+                if ready:
+                    yield ready
+                if isinstance(item, _Failure):
+                    raise item.error
+                return
+            ready.append(item)
+        yield ready
+
+
+async def aiter_batches(aiterable: AsyncIterable[T]) -> AsyncIterator[List[T]]:
+    """Asynchronous version of iter_batches."""
+    items: asyncio.Queue = asyncio.Queue()
+
+    async def read() -> None:
+        try:
+            async for item in aiterable:
+                items.put_nowait(item)
+        except Exception as e:
+            items.put_nowait(_Failure(e))
+        finally:
+            items.put_nowait(_DONE)
+
+    reader = asyncio.ensure_future(read())
+    try:
+        while True:
+            batch = [await items.get()]
+            while not items.empty():
+                batch.append(items.get_nowait())
+            ready: List[T] = []
+            for item in batch:
+                if item is _DONE or isinstance(item, _Failure):
+                    if ready:
+                        yield ready
+                    if isinstance(item, _Failure):
+                        raise item.error
+                    return
+                ready.append(item)
+            yield ready
+    finally:
+        reader.cancel()
+
+
+class LineWriter:
+    """
+    Buffers text written to it and writes it to out, by default stdout, on
+    flush with a single write. Unless whole_lines is False, only complete
+    lines are written, every line starting with prefix.
+    """
+
+    def __init__(
+        self,
+        prefix: str = "",
+        out: Optional[TextIO] = None,
+        whole_lines: bool = True,
+    ):
+        self.prefix = prefix
+        self.out = out
+        self.whole_lines = whole_lines
+        self.pending: List[str] = []
+        self.partial = ""
+
+    def write(self, text: str) -> None:
+        if not self.whole_lines:
+            self.pending.append(text)
+            return
+        self.partial += text
+        *lines, self.partial = self.partial.split("\n")
+        self.pending.extend(f"{self.prefix}{line}\n" for line in lines)
+
+    def flush(self, final: bool = False) -> None:
+        """
+        Write the buffered text. A final flush also writes an incomplete
+        last line.
+        """
+        if final and self.partial:
+            self.pending.append(f"{self.prefix}{self.partial}\n")
+            self.partial = ""
+        if not self.pending:
+            return
+        text = "".join(self.pending)
+        self.pending = []
+        out = self.out or sys.stdout
+        with print_lock:
+            out.write(text)
+            out.flush()
+
+
+def print_lines(chunks: Iterable[str], prefix: str = "") -> None:
+    """
+    Print text arriving in chunks line by line, starting every line with
+    prefix, writing once per chunk.
+    """
+    writer = LineWriter(prefix)
+    for chunk in chunks:
+        writer.write(chunk)
+        writer.flush()
+    writer.flush(final=True)
+
+
+def print_stream(chunks: Iterable[bytes], prefix: str = "") -> None:
+    """
+    Print a blocking stream of bytes, such as container output. Without a
+    prefix, incomplete lines are printed as they arrive.
+    """
+    writer = LineWriter(prefix, whole_lines=bool(prefix))
+    for batch in iter_batches(iter_text(chunks)):
+        for text in batch:
+            writer.write(text)
+        writer.flush()
+    writer.flush(final=True)
+
+
+async def aprint_stream(
+    chunks: AsyncIterable[bytes], prefix: str = ""
+) -> None:
+    """Asynchronous version of print_stream."""
+    writer = LineWriter(prefix, whole_lines=bool(prefix))
+    async for batch in aiter_batches(aiter_text(chunks)):
+        for text in batch:
+            writer.write(text)
+        writer.flush()
+    writer.flush(final=True)
+
+
+def print_build_stream(
+    build_stream: Iterable[bytes], prefix: str = ""
+) -> Optional[str]:
+    """
+    Print the output of a docker build, followed by the number of steps
+    that reused cached layers.
+
+    Returns:
+        The ID of the built image, if the build succeeded
+
+    """
+    writer = LineWriter(prefix)
+    image_id = None
+    total = None
+    cache_hits = 0
+    for batch in iter_batches(iter_build_events(build_stream)):
+        for event in batch:
+            if event.kind == "image":
+                image_id = event.text
+                continue
+            if event.kind == "cache_hit":
+                cache_hits += 1
+            total = event.total
+            writer.write(event.text + "\n")
+        writer.flush()
+    if image_id is not None and total:
+        writer.write(f"Reused cached layers for {cache_hits}/{total} steps\n")
+    writer.flush(final=True)
+    return image_id
@@ -1,13 +1,11 @@
-import json
 import logging
 import os
 import pkgutil
+import subprocess
 from pathlib import Path
-from shutil import copyfile, copytree, rmtree
+from shutil import rmtree, which
 from typing import Any, Union
 
-from jinja2 import Template
-
 logger = logging.getLogger(__name__)
 
 
@@ -23,27 +21,14 @@ def create_dir(dir: Union[str, Path], mode: str = "overwrite"):
         os.mkdir(dir)
 
 
-def copy_contents_to_target_dir(
-    source_dir: Union[str, Path], target_dir: Union[str, Path]
-):
-    for file_or_folder in os.listdir(source_dir):
-        copy(file_or_folder, target_dir)
-
-
-def copy(file_or_folder: Union[str, Path], target_dir: Union[str, Path]):
-    target_location = os.path.join(target_dir, file_or_folder)
-    if os.path.isdir(file_or_folder):
-        copytree(file_or_folder, target_location)
-    else:
-        copyfile(file_or_folder, target_location)
-
-
 def write_to_file(file_name: str, file_content: str):
     with open(file_name, "w") as f:
         f.write(file_content)
 
 
 def render_template(mode: str, file: str, **kwargs: Any) -> str:
+    from jinja2 import Template
+
     file = get_pkg_file(mode, file).decode("utf-8")
     if kwargs:
         file = Template(file).render(**kwargs)
@@ -61,16 +46,31 @@ def get_pkg_file(mode: str, file: str) -> bytes:
         )
 
 
-def print_build_stream(build_stream) -> None:
-    for msg in build_stream:
-        msgs = msg.decode("utf8").split("\r\n")
-        for line in msgs:
-            if line:
-                line_dict = json.loads(line)
-                if "stream" in line_dict:
-                    print(line_dict["stream"], end="")
-
-
-def print_container_stream(container_stream) -> None:
-    for msg in container_stream:
-        print(msg.decode("utf-8"), end="")
+def get_nervosum_dir() -> str:
+    """
+    Directory holding the local state of nervosum, `~/.nervosum` unless the
+    NERVOSUM_HOME environment variable is set.
+    """
+    nervosum_dir = os.environ.get(
+        "NERVOSUM_HOME", os.path.join(os.path.expanduser("~"), ".nervosum")
+    )
+    os.makedirs(nervosum_dir, exist_ok=True)
+    return nervosum_dir
+
+
+def buildkit_available() -> bool:
+    """
+    Whether images can be built with BuildKit through `docker buildx`, unless
+    disabled by setting DOCKER_BUILDKIT=0.
+    """
+    if os.environ.get("DOCKER_BUILDKIT") == "0":
+        return False
+    docker_cli = which("docker")
+    if docker_cli is None:
+        return False
+    result = subprocess.run(
+        [docker_cli, "buildx", "version"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    return result.returncode == 0
@@ -0,0 +1,56 @@
+"""Process-level registry of loaded models.
+
+Spark pickles the functions passed to `mapInPandas` by value, so any state
+they keep is rebuilt for every task. This module is shipped to the executors
+with `--py-files` and imported by name instead, so it lives in `sys.modules`
+of the Python worker and the models it holds are reused across partitions
+and, with `spark.python.worker.reuse`, across tasks.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.StreamHandler())
+logger.setLevel("INFO")
+
+__all__ = ["get_model"]
+
+_lock = threading.Lock()
+_models: Dict[str, Any] = {}
+_uses: Dict[str, int] = {}
+
+
+def get_model(key: str, load: Callable[[], Any]) -> Tuple[Any, float, int]:
+    """
+    Return the model registered under key, loading it with load on first use.
+
+    Args:
+        key (str): Name the model is registered under
+        load (Callable[[], Any]): Function returning a new model instance
+
+    Returns:
+        The model, the seconds spent loading it by this call and the number
+        of times the model has been used in this process, this call included
+
+    """
+    with _lock:
+        load_seconds = 0.0
+        if key not in _models:
+            start = time.time()
+            _models[key] = load()
+            load_seconds = time.time() - start
+            logger.info(
+                f"Loaded model {key} in {load_seconds:.2f}s "
+                f"(pid {os.getpid()})"
+            )
+        _uses[key] = _uses.get(key, 0) + 1
+        if _uses[key] > 1:
+            logger.info(
+                f"Reusing model {key} (pid {os.getpid()}, "
+                f"use {_uses[key]})"
+            )
+        return _models[key], load_seconds, _uses[key]
@@ -17,17 +17,18 @@ add the zip file to `sys.path` and import as usual.
 
 __version__ = "0.1"
 
-import glob
+import fcntl
+import hashlib
 import imp
 import logging
 import os
-import pathlib
 import sys
 import tempfile
+import threading
 import warnings
 import zipimport
 from importlib.machinery import EXTENSION_SUFFIXES
-from typing import Any, Callable, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 
 logger = logging.getLogger(__name__)
 logger.setLevel("INFO")
@@ -39,7 +40,19 @@ __all__ = [
     "uninstall",
 ]
 
-tmp_library_folder = tempfile.TemporaryDirectory()
+# Extracted shared objects are kept per archive, in a directory named after
+# the path, size and modification time of the archive, such that all
+# processes of a user on a node share them without reading the archive to
+# identify it. Shared objects in the cache are loaded as found, so it must
+# only be writable by the current user.
+CACHE_DIR = os.environ.get(
+    "PYDZIPIMPORT_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), f"pydzipimport-{os.getuid()}"),
+)
+
+# Wheels repaired by auditwheel vendor their shared libraries in a
+# "<distribution>.libs" directory, which not always matches the package name.
+_LIBS_DIRS = {"sklearn": "scikit_learn.libs"}
 
 
 def _call_with_frames_removed(f: Callable, *args: Any, **kwds: Any):
@@ -49,10 +62,102 @@ def _call_with_frames_removed(f: Callable, *args: Any, **kwds: Any):
     return f(*args, **kwds)
 
 
+def _private_dir(path: str) -> str:
+    """Create the directory at path, only accessible to the current user,
+    unless it exists. Refuse a directory others could have written to.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    stat = os.lstat(path)
+    if (
+        not os.path.isdir(path)
+        or os.path.islink(path)
+        or stat.st_uid != os.getuid()
+        or stat.st_mode & 0o022
+    ):
+        raise ImportError(
+            f"Not extracting to {path}, which is not a directory only "
+            "the current user can write to"
+        )
+    return path
+
+
+def _archive_key(archive: str) -> str:
+    """Identify an archive by its stat, which is cheap, unlike hashing its
+    content, which would be done by every Python worker process.
+    """
+    path = os.path.realpath(archive)
+    stat = os.stat(path)
+    key = f"{path}\0{stat.st_size}\0{stat.st_mtime_ns}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+class _ArchiveIndex:
+    """The shared objects of an archive, indexed once per archive and
+    process, and their location in the extraction cache.
+    """
+
+    def __init__(self, archive: str, files: Dict[str, Tuple]) -> None:
+        self.archive = archive
+        # Shared libraries per "<distribution>.libs" directory.
+        self.libs: Dict[str, List[str]] = {}
+        for path in files:
+            libs_dir, _, name = path.partition("/")
+            if libs_dir.endswith(".libs") and ".so" in name:
+                self.libs.setdefault(libs_dir, []).append(path)
+        self._cache_dir: Optional[str] = None
+        self._extracted: Set[str] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def cache_dir(self) -> str:
+        if self._cache_dir is None:
+            self._cache_dir = _private_dir(
+                os.path.join(
+                    _private_dir(CACHE_DIR), _archive_key(self.archive)
+                )
+            )
+        return self._cache_dir
+
+    def libs_for(self, path: str) -> List[str]:
+        """Shared libraries the extension module at path may link to."""
+        package = path.split("/")[0]
+        return self.libs.get(_LIBS_DIRS.get(package, package + ".libs"), [])
+
+    def extract(self, importer: zipimport.zipimporter, path: str) -> str:
+        """Return the location of path in the extraction cache, extracting
+        it from the archive unless a process did so before.
+        """
+        target = os.path.join(self.cache_dir, *path.split("/"))
+        with self._lock:
+            if path in self._extracted:
+                return target
+            # Files are renamed into place once complete, so one that exists
+            # can be used without taking the lock.
+            if not os.path.exists(target):
+                with open(os.path.join(self.cache_dir, ".lock"), "w") as lock:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                    if not os.path.exists(target):
+                        os.makedirs(os.path.dirname(target), exist_ok=True)
+                        data = importer.get_data(path)
+                        if not isinstance(data, bytes):
+                            raise ImportError(f"Can not extract {path}")
+                        partial = f"{target}.{os.getpid()}.partial"
+                        with open(partial, "wb") as f:
+                            f.write(data)
+                        os.replace(partial, target)
+                        logger.debug(f"Extracted {path} to {target}")
+            self._extracted.add(path)
+        return target
+
+
+_indexes: Dict[str, _ArchiveIndex] = {}
+_indexes_lock = threading.Lock()
+
+
 class PydZipImporter(zipimport.zipimporter):
     """A ZipImporter which allows loading C extension modules.
-    To load a C extension module, the shared object contents are
-    writen to a temporary file.
+    To load a C extension module, the shared object and the libraries
+    vendored next to it are extracted to an on-disk cache.
     """
 
     _files: Dict[str, Tuple]
@@ -61,6 +166,17 @@ class PydZipImporter(zipimport.zipimporter):
         os.sep + "__init__" + s for s in EXTENSION_SUFFIXES
     ] + EXTENSION_SUFFIXES
 
+    def __init__(self, path: str) -> None:
+        super().__init__(path)
+        # An importer is created for every package directory in the archive,
+        # all of them share the index of the archive.
+        with _indexes_lock:
+            if self.archive not in _indexes:
+                _indexes[self.archive] = _ArchiveIndex(
+                    self.archive, self._files
+                )
+            self._index = _indexes[self.archive]
+
     def _get_extension_module_info(
         self, fullname: str
     ) -> Optional[Tuple[str, str]]:
@@ -101,7 +217,7 @@ class PydZipImporter(zipimport.zipimporter):
 
     def find_loader(
         self, fullname: str, path: str = None
-    ) -> Tuple[Optional[zipimport.zipimporter], List[str]]:
+    ) -> Tuple[Optional[Any], List[str]]:
         """Check whether we can satisfy the import of the module named by
         'fullname', or whether it could be a portion of a namespace
         package.
@@ -109,98 +225,32 @@ class PydZipImporter(zipimport.zipimporter):
         info = self._get_extension_module_info(fullname)
 
         if info:
-            suffix, fullpath = info
-            fakepath = self.archive + os.sep + fullpath
-
-            data = self.get_data(fullpath)
-            if ".so" in suffix and isinstance(data, bytes):
-                extra_libs = []
-                module_name = fullpath.split("/")[0]
-                if module_name == "sklearn":
-                    dylib_dr = "scikit_learn.libs"
-                else:
-                    dylib_dr = module_name + ".libs/"
-                dylib_files = [
-                    x
-                    for x in self._files.keys()
-                    if (dylib_dr in x) and ".so" in str(x)
-                ]
-
-                for lib_path in dylib_files:
-                    new_lib_path = os.path.join(
-                        tmp_library_folder.name, lib_path
-                    )
-
-                    if len(glob.glob(new_lib_path, recursive=True)) == 0:
-                        # create parent paths
-                        parent_dir = os.path.join(
-                            tmp_library_folder.name, *lib_path.split("/")[:-1]
-                        )
-                        pathlib.Path(parent_dir).mkdir(
-                            parents=True, exist_ok=True
-                        )
-                        lib_data = self.get_data(lib_path)
-                        if isinstance(lib_data, bytes):
-                            with open(new_lib_path, "wb") as f:
-                                f.write(lib_data)
-                                f.flush()
-
-                    extra_libs.append((lib_path, new_lib_path))
-                temporary_folder_loader = TemporaryExtensionFolderLoader(
-                    fakepath
-                )
-                temporary_folder_loader.add_temporary_folder_data(
-                    fullname,
-                    so_path=fullpath,
-                    so_content=data,
-                    extra_libs=extra_libs,
-                    prefix=self.prefix,
-                    archive=self.archive,
-                )
-                return (
-                    temporary_folder_loader,
-                    [],
-                )
-
-            ext = suffix
-            if ext.startswith(os.sep + "__init__"):
-                x = len(os.sep + "__init__")
-                ext = ext[x:]
-            ext = "." + fullname.split(".")[-1] + ext
-
-            temporary_extension_file_loader = TemporaryExtensionFileLoader(
-                fakepath
-            )
-            temporary_extension_file_loader.add_temporary_file_data(
-                fullname, data, ext
-            )
+            _, fullpath = info
+            # The cache mirrors the layout of the archive, so relative
+            # rpaths of the module to its vendored libraries resolve.
+            for lib_path in self._index.libs_for(fullpath):
+                self._index.extract(self, lib_path)
+            filename = self._index.extract(self, fullpath)
             return (
-                temporary_extension_file_loader,
+                TemporaryExtensionFileLoader(
+                    self.archive + os.sep + fullpath, fullname, filename
+                ),
                 [],
             )
 
         return super().find_loader(fullname, path)
 
 
-class TemporaryExtensionFileLoader(PydZipImporter):
-    """An extension file loader which takes a (fake) path and bytearray
-    of data. The shared object (given in data) is written to a named
-    temporary file before being loaded.
+class TemporaryExtensionFileLoader:
+    """An extension file loader which takes a (fake) path and the location
+    the shared object was extracted to, from which it is loaded.
     Based upon `importlib.machinery.ExtensionFileLoader`.
     """
 
-    _files: Dict[str, Tuple]
-
-    def __init__(self, path: str) -> None:
+    def __init__(self, path: str, name: str, filename: str) -> None:
         self.path = path
-
-    def add_temporary_file_data(
-        self, name: str, data: str, suffix: str
-    ) -> None:
-        self.data = tempfile.NamedTemporaryFile(suffix=suffix, mode="w")
-        self.data.write(data)
-        self.data.flush()
         self.name = name
+        self.filename = filename
 
     def load_module(self, fullname: Optional[str]):
         """Load an extension module."""
@@ -215,7 +265,7 @@ class TemporaryExtensionFileLoader(PydZipImporter):
         is_reload = fullname in sys.modules
         try:
             module = _call_with_frames_removed(
-                imp.load_dynamic, fullname, self.data.name
+                imp.load_dynamic, fullname, self.filename
             )
             module.__file__ = self.path  # Set this to our fake path!
             if self.is_package(fullname) and not hasattr(module, "__path__"):
@@ -253,50 +303,6 @@ class TemporaryExtensionFileLoader(PydZipImporter):
         return None
 
 
-class TemporaryExtensionFolderLoader(TemporaryExtensionFileLoader):
-    """An extension folder loader which takes a (fake) path and bytearray
-    of data. The shared object (given in data) is written to a named
-    temporary file before being loaded. Moreover, potential compiled libraries
-    are added to the temporary folder structure.
-    Based upon `importlib.machinery.ExtensionFileLoader`.
-    """
-
-    def __init__(self, path: str) -> None:
-        self.path = path
-
-    def add_temporary_folder_data(
-        self,
-        name: str,
-        so_path: str,
-        so_content: bytes,
-        extra_libs: List[Tuple[str, str]],
-        prefix: str,
-        archive: str,
-    ):
-        self.folder = tempfile.TemporaryDirectory()
-        self.prefix = prefix
-        self.archive = archive
-        self._files: Dict[str, Tuple] = {}
-
-        pathlib.Path(
-            os.path.join(self.folder.name, *so_path.split("/")[:-1])
-        ).mkdir(parents=True, exist_ok=True)
-
-        with open(os.path.join(self.folder.name, so_path), "wb") as f:
-            f.write(so_content)
-            f.flush()
-
-        for lib in extra_libs:
-            pathlib.Path(
-                os.path.join(self.folder.name, *lib[0].split("/")[:-1])
-            ).mkdir(parents=True, exist_ok=True)
-
-            os.symlink(lib[1], os.path.join(self.folder.name, lib[0]))
-
-        self.data = open(os.path.join(self.folder.name, so_path), "r")
-        self.name = name
-
-
 def install():
     """Replace the zipimport.zipimporter path hook with PydZipImporter."""
     if PydZipImporter not in sys.path_hooks:
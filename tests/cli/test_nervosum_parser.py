@@ -17,7 +17,15 @@ def run() -> Callable:
         name: Optional[str] = None, tag: Optional[str] = None
     ) -> argparse.Namespace:
         return argparse.Namespace(
-            cmd="run", name=name, nervosum_module="nervosum.core.run", tag=tag
+            cmd="run",
+            name=name,
+            nervosum_module="nervosum.core.run",
+            tag=tag,
+            port=5000,
+            replicas=1,
+            balance="round-robin",
+            cpus=None,
+            memory=None,
         )
 
     return create_run_namespace
@@ -45,7 +53,11 @@ def test_nervosum_parser_input_run(
 
 def test_nervosum_parser_input_ls_no_inputs() -> None:
     expected = argparse.Namespace(
-        cmd="ls", filter=None, nervosum_module="nervosum.core.list"
+        cmd="ls",
+        filter=None,
+        format="table",
+        limit=None,
+        nervosum_module="nervosum.core.list",
     )
 
     assert expected == parse_args(["ls"])
@@ -55,6 +67,8 @@ def test_nervosum_parser_input_ls_filter() -> None:
     expected = argparse.Namespace(
         cmd="ls",
         filter=["key==value", "key2==value2"],
+        format="table",
+        limit=None,
         nervosum_module="nervosum.core.list",
     )
 
@@ -72,7 +86,12 @@ def test_nervosum_parser_input_build_dir() -> None:
     expected = argparse.Namespace(
         cmd="build",
         c="nervosum.yaml",
-        dir=".",
+        dir=["."],
+        force=False,
+        dry_run=False,
+        cache_from=None,
+        cache_to=None,
+        jobs=4,
         nervosum_module="nervosum.core.build",
     )
 
@@ -81,7 +100,15 @@ def test_nervosum_parser_input_build_dir() -> None:
 
 def test_nervosum_parser_input_build_config() -> None:
     expected = argparse.Namespace(
-        cmd="build", c="a_file", dir=".", nervosum_module="nervosum.core.build"
+        cmd="build",
+        c="a_file",
+        dir=["."],
+        force=False,
+        dry_run=False,
+        cache_from=None,
+        cache_to=None,
+        jobs=4,
+        nervosum_module="nervosum.core.build",
     )
 
     assert expected == parse_args(["build", ".", "-c", "a_file"])
@@ -89,9 +116,102 @@ def test_nervosum_parser_input_build_config() -> None:
 
 def test_nervosum_parser_input_build_config_overwrite() -> None:
     expected = argparse.Namespace(
-        cmd="build", c="a_file", dir=".", nervosum_module="nervosum.core.build"
+        cmd="build",
+        c="a_file",
+        dir=["."],
+        force=False,
+        dry_run=False,
+        cache_from=None,
+        cache_to=None,
+        jobs=4,
+        nervosum_module="nervosum.core.build",
     )
 
     assert expected == parse_args(
         ["build", ".", "-c", "b_file", "-c", "a_file"]
     )
+
+
+def test_nervosum_parser_input_build_force() -> None:
+    expected = argparse.Namespace(
+        cmd="build",
+        c="nervosum.yaml",
+        dir=["."],
+        force=True,
+        dry_run=False,
+        cache_from=None,
+        cache_to=None,
+        jobs=4,
+        nervosum_module="nervosum.core.build",
+    )
+
+    assert expected == parse_args(["build", ".", "--force"])
+
+
+def test_nervosum_parser_input_build_dry_run() -> None:
+    args = parse_args(["build", ".", "--dry-run"])
+    assert args.dry_run
+    assert not args.force
+
+
+def test_nervosum_parser_input_build_cache() -> None:
+    args = parse_args(
+        [
+            "build",
+            ".",
+            "--cache-from",
+            "type=local,src=/cache",
+            "--cache-from",
+            "nervosum/a_name:a_tag",
+            "--cache-to",
+            "type=local,dest=/cache",
+        ]
+    )
+    assert args.cache_from == [
+        "type=local,src=/cache",
+        "nervosum/a_name:a_tag",
+    ]
+    assert args.cache_to == "type=local,dest=/cache"
+
+
+def test_nervosum_parser_input_build_dirs() -> None:
+    args = parse_args(["build", "a_dir", "models/*", "-j", "2"])
+    assert args.dir == ["a_dir", "models/*"]
+    assert args.jobs == 2
+
+
+def test_nervosum_parser_input_ls_format() -> None:
+    args = parse_args(["ls", "--format", "json", "--limit", "5"])
+    assert args.format == "json"
+    assert args.limit == 5
+    with pytest.raises(SystemExit):
+        parse_args(["ls", "--format", "xml"])
+
+
+def test_nervosum_parser_input_bench() -> None:
+    args = parse_args(["bench", "-n", "a_name", "--rate", "100"])
+    assert args.nervosum_module == "nervosum.core.bench"
+    assert (args.name, args.rate, args.concurrency) == ("a_name", 100, 8)
+    assert (args.replicas, args.duration, args.format) == (1, 30, "table")
+    assert parse_args(["bench", "--warmup", "0"]).warmup == 0
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ["run", "--replicas", "0"],
+        ["bench", "--replicas", "-1"],
+        ["bench", "--concurrency", "0"],
+        ["build", "a_dir", "--jobs", "0"],
+        ["build", "a_dir", "-j", "-3"],
+        ["bench", "--rate", "0"],
+        ["bench", "--rate", "-5"],
+        ["bench", "--duration", "0"],
+        ["bench", "--warmup", "-1"],
+        ["bench", "--duration", "nan"],
+        ["bench", "--duration", "inf"],
+    ],
+)
+def test_nervosum_parser_input_not_positive(args) -> None:
+    with pytest.raises(SystemExit):
+        parse_args(args)
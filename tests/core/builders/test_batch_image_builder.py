@@ -0,0 +1,188 @@
+from typing import Any, Callable, Dict
+
+import pytest
+
+from nervosum.config import NervosumConfig
+from nervosum.core.builders.batch_image_builder import BatchImageBuilder
+
+
+@pytest.fixture
+def generate_config() -> Callable:
+    def fun(**deployment: Any) -> NervosumConfig:
+        config: Dict[str, Any] = {
+            "name": "a_name",
+            "deployment": {
+                "mode": "batch",
+                "platform_tag": "a_platform_tag",
+                **deployment,
+            },
+            "src": "a_src",
+            "tag": "a_tag",
+            "interface": {"model_module": "a_module", "model_class": "Model"},
+            "requirements": "requirements.txt",
+            "input_schema": [
+                {"name": "id", "type": "int"},
+                {"name": "field", "type": "float"},
+            ],
+            "output_schema": [{"name": "prediction", "type": "int"}],
+        }
+        return NervosumConfig(**config)
+
+    return fun
+
+
+def generate_wrapper(tmp_path, config: NervosumConfig) -> str:
+    builder = BatchImageBuilder(source_dir=".", target_dir=str(tmp_path))
+    builder.generate_wrapper_files(config)
+    wrapper = (tmp_path / "wrapper.py").read_text()
+    compile(wrapper, "wrapper.py", "exec")
+    return wrapper
+
+
+def test_generate_wrapper_files(tmp_path, generate_config) -> None:
+    wrapper = generate_wrapper(tmp_path, generate_config())
+    assert "from a_src.a_module import Model" in wrapper
+    assert (tmp_path / "Dockerfile").exists()
+    assert (tmp_path / "pydzipimport_linux.py").exists()
+
+
+def test_generate_wrapper_files_report(tmp_path, generate_config) -> None:
+    wrapper = generate_wrapper(tmp_path, generate_config())
+    assert "partition_stats.add(" in wrapper
+    assert "--report_path" in (tmp_path / "Dockerfile").read_text()
+
+
+def test_generate_wrapper_files_formats(tmp_path, generate_config) -> None:
+    config = generate_config(
+        source={"format": "parquet"},
+        output={
+            "format": "orc",
+            "partition_by": ["prediction"],
+            "compression": "zlib",
+        },
+    )
+    wrapper = generate_wrapper(tmp_path, config)
+    assert 'spark.read.format("parquet")' in wrapper
+    assert '("id", "bigint")' in wrapper
+    assert 'OUTPUT_OPTIONS = {"compression": "zlib"}' in wrapper
+    assert 'partitionBy(*["prediction"])' in wrapper
+    dockerfile = (tmp_path / "Dockerfile").read_text()
+    assert "/app/data/input.parquet" in dockerfile
+    assert "/app/data/output.orc" in dockerfile
+
+
+def test_generate_wrapper_files_csv_header(tmp_path, generate_config):
+    wrapper = generate_wrapper(tmp_path, generate_config())
+    assert 'SOURCE_OPTIONS = {"header": "true"}' in wrapper
+
+
+def test_generate_wrapper_files_partition_unknown_column(
+    tmp_path, generate_config
+) -> None:
+    config = generate_config(output={"partition_by": ["unknown"]})
+    with pytest.raises(ValueError):
+        generate_wrapper(tmp_path, config)
+
+
+def test_generate_wrapper_files_output_schema(tmp_path, generate_config):
+    config = generate_config(
+        spark={
+            "passthrough_columns": ["id"],
+            "arrow_max_records_per_batch": 5000,
+            "partitions": 16,
+        },
+        output={"partition_by": ["id"]},
+    )
+    wrapper = generate_wrapper(tmp_path, config)
+    assert 'OUTPUT_SCHEMA = "`id` bigint, `prediction` bigint"' in wrapper
+    assert 'PASSTHROUGH_COLUMNS = ["id"]' in wrapper
+    assert '"spark.sql.execution.arrow.maxRecordsPerBatch",' in wrapper
+    assert "spark_df.repartition(16)" in wrapper
+
+
+def test_generate_wrapper_files_passthrough_unknown_column(
+    tmp_path, generate_config
+) -> None:
+    config = generate_config(spark={"passthrough_columns": ["unknown"]})
+    with pytest.raises(ValueError):
+        generate_wrapper(tmp_path, config)
+
+
+def test_generate_wrapper_files_single_pass(tmp_path, generate_config):
+    wrapper = generate_wrapper(tmp_path, generate_config())
+    assert "predictions.show(" not in wrapper
+    assert "preview.show(20, truncate=False)" in wrapper
+    assert ".persist(" not in wrapper
+
+
+@pytest.mark.parametrize("mode", ["append", "ignore"])
+def test_generate_wrapper_files_preview_other_runs(
+    tmp_path, generate_config, mode: str
+) -> None:
+    config = generate_config(output={"mode": mode})
+    wrapper = generate_wrapper(tmp_path, config)
+    assert "preview = predictions.limit(20)" in wrapper
+    assert ".load(args.output_path)" not in wrapper
+    assert '.mode("overwrite")' not in wrapper
+
+
+@pytest.mark.parametrize(
+    ["persist", "expected"],
+    [
+        ("memory_and_disk", "persist(StorageLevel.MEMORY_AND_DISK)"),
+        ("checkpoint", "predictions.checkpoint(eager=True)"),
+    ],
+)
+def test_generate_wrapper_files_persist(
+    tmp_path, generate_config, persist: str, expected: str
+) -> None:
+    config = generate_config(spark={"persist": persist, "preview_rows": 0})
+    wrapper = generate_wrapper(tmp_path, config)
+    assert expected in wrapper
+    assert "preview.show(" not in wrapper
+
+
+def test_generate_wrapper_files_model_registry(tmp_path, generate_config):
+    config = generate_config(spark={"reuse_worker": False})
+    wrapper = generate_wrapper(tmp_path, config)
+    assert "model_registry.get_model(" in wrapper
+    assert '"spark.python.worker.reuse",\n            "false",' in wrapper
+    assert (tmp_path / "model_registry.py").exists()
+    dockerfile = (tmp_path / "Dockerfile").read_text()
+    assert "model_dependencies.zip,./model_registry.py" in dockerfile
+
+
+@pytest.mark.parametrize(
+    ["dependencies", "expected"],
+    [
+        ("image", "spark.executorEnv.PYTHONPATH=/app:/app/model_dependencies"),
+        ("archive", "--archives ./model_dependencies.tar.gz#environment"),
+    ],
+)
+def test_generate_wrapper_files_dependencies(
+    tmp_path, generate_config, dependencies: str, expected: str
+) -> None:
+    config = generate_config(dependencies=dependencies)
+    wrapper = generate_wrapper(tmp_path, config)
+    assert "pydzipimport_linux" not in wrapper
+    assert not (tmp_path / "pydzipimport_linux.py").exists()
+    dockerfile = (tmp_path / "Dockerfile").read_text()
+    assert expected in dockerfile
+    assert "model_dependencies.zip" not in dockerfile
+
+
+def test_generate_wrapper_files_archive(tmp_path, generate_config) -> None:
+    config = generate_config(dependencies="archive")
+    generate_wrapper(tmp_path, config)
+    dockerfile = (tmp_path / "Dockerfile").read_text()
+    assert " python3-venv" in dockerfile
+    assert "--platform" not in dockerfile
+    assert "rm -rf /opt/model-env" in dockerfile
+
+
+def test_generate_wrapper_files_buildkit(tmp_path, generate_config) -> None:
+    builder = BatchImageBuilder(source_dir=".", buildkit=True)
+    dockerfile = builder.render_wrapper_files(generate_config())["Dockerfile"]
+    assert dockerfile.startswith("# syntax=docker/dockerfile:1\n")
+    assert "--mount=type=cache,target=/var/cache/apt" in dockerfile
+    assert dockerfile.index("COPY . /app") > dockerfile.index("zip -r")
@@ -0,0 +1,289 @@
+import importlib.util
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator
+
+import pytest
+
+from nervosum.config import NervosumConfig, SchemaField
+from nervosum.core.builders.flask_image_builder import FlaskImageBuilder
+
+
+@pytest.fixture
+def generate_config() -> Callable:
+    def fun(**deployment: Any) -> NervosumConfig:
+        config: Dict[str, Any] = {
+            "name": "a_name",
+            "deployment": {"mode": "http", **deployment},
+            "src": "a_src",
+            "tag": "a_tag",
+            "interface": {"model_module": "a_module", "model_class": "Model"},
+            "requirements": "requirements.txt",
+            "input_schema": [{"name": "field", "type": "float"}],
+            "output_schema": [{"name": "prediction", "type": "int"}],
+        }
+        return NervosumConfig(**config)
+
+    return fun
+
+
+def generate_wrapper(tmp_path, config: NervosumConfig) -> str:
+    builder = FlaskImageBuilder(source_dir=".", target_dir=str(tmp_path))
+    builder.generate_wrapper_files(config)
+    wrapper = (tmp_path / "wrapper.py").read_text()
+    compile(wrapper, "wrapper.py", "exec")
+    return wrapper
+
+
+def test_generate_wrapper_files(tmp_path, generate_config) -> None:
+    wrapper = generate_wrapper(tmp_path, generate_config())
+    assert "from a_src.a_module import Model" in wrapper
+    assert '"/predict/batch"' in wrapper
+    assert "MicroBatcher" not in wrapper
+    assert (tmp_path / "Dockerfile").exists()
+    assert (tmp_path / "wrapper_requirements.txt").exists()
+
+
+def test_generate_wrapper_files_batching(tmp_path, generate_config) -> None:
+    config = generate_config(
+        batching={"enabled": True, "max_batch_size": 8, "max_wait_ms": 2}
+    )
+    wrapper = generate_wrapper(tmp_path, config)
+    assert "batcher.submit(columns)" in wrapper
+    assert "max_batch_size=8" in wrapper
+
+
+def test_generate_wrapper_files_flask_server(tmp_path, generate_config):
+    generate_wrapper(tmp_path, generate_config())
+    dockerfile = (tmp_path / "Dockerfile").read_text()
+    assert 'CMD ["./wrapper.py"]' in dockerfile
+    assert not (tmp_path / "gunicorn.conf.py").exists()
+
+
+@pytest.mark.parametrize(
+    ["engine", "app", "requirement"],
+    [
+        ("gunicorn", "wrapper:app", "gunicorn"),
+        ("uvicorn", "wrapper:asgi_app", "uvicorn"),
+    ],
+)
+def test_generate_wrapper_files_server_engine(
+    tmp_path, generate_config, engine: str, app: str, requirement: str
+) -> None:
+    config = generate_config(
+        server={"engine": engine, "workers": 4, "threads": 2, "keepalive": 5}
+    )
+    generate_wrapper(tmp_path, config)
+    dockerfile = (tmp_path / "Dockerfile").read_text()
+    assert f'"gunicorn.conf.py", "{app}"]' in dockerfile
+    requirements = (tmp_path / "wrapper_requirements.txt").read_text()
+    assert requirement in requirements.split()
+    server_config = (tmp_path / "gunicorn.conf.py").read_text()
+    compile(server_config, "gunicorn.conf.py", "exec")
+    assert "workers = 4" in server_config
+    assert "keepalive = 5" in server_config
+
+
+def test_generate_wrapper_files_preload(tmp_path, generate_config) -> None:
+    config = generate_config(server={"engine": "gunicorn", "preload": True})
+    wrapper = generate_wrapper(tmp_path, config)
+    assert "\nwarm_up()" not in wrapper
+    assert '"/ready"' in wrapper
+    server_config = (tmp_path / "gunicorn.conf.py").read_text()
+    compile(server_config, "gunicorn.conf.py", "exec")
+    assert "preload_app = True" in server_config
+    assert "wrapper.warm_up()" in server_config
+
+
+def test_generate_wrapper_files_input_fields(tmp_path, generate_config):
+    wrapper = generate_wrapper(tmp_path, generate_config())
+    namespace: Dict[str, Any] = {}
+    start = wrapper.index("INPUT_FIELDS = [")
+    end = wrapper.index("]\n", start) + 1
+    exec(wrapper[start:end], namespace)
+    assert namespace["INPUT_FIELDS"] == [("field", "float64", (int, float))]
+    assert "{'name': 'field', 'type': 'float'}" in wrapper
+
+
+def test_generate_wrapper_files_binary_formats(tmp_path, generate_config):
+    config = generate_config(binary_formats=["arrow", "numpy"])
+    wrapper = generate_wrapper(tmp_path, config)
+    assert "def decode_arrow" in wrapper
+    assert "def decode_numpy" in wrapper
+    requirements = (tmp_path / "wrapper_requirements.txt").read_text()
+    assert "pyarrow" in requirements.split()
+
+
+def test_generate_wrapper_files_numpy_needs_fixed_width(
+    tmp_path, generate_config
+) -> None:
+    config = generate_config(binary_formats=["numpy"])
+    config.input_schema[0].type = "str"
+    with pytest.raises(ValueError):
+        generate_wrapper(tmp_path, config)
+
+
+def test_generate_wrapper_files_stream(tmp_path, generate_config) -> None:
+    config = generate_config(batching={"stream_chunk_size": 250})
+    wrapper = generate_wrapper(tmp_path, config)
+    assert '"/predict/stream"' in wrapper
+    assert "STREAM_CHUNK_SIZE = 250" in wrapper
+
+
+def test_generate_wrapper_files_cache(tmp_path, generate_config) -> None:
+    config = generate_config(
+        cache={"enabled": True, "max_size": 100, "ttl_seconds": 30}
+    )
+    wrapper = generate_wrapper(tmp_path, config)
+    assert "max_size=100, ttl=30.0" in wrapper
+    assert '"/cache"' in wrapper
+    assert "PredictionCache" not in generate_wrapper(
+        tmp_path, generate_config()
+    )
+
+
+def test_generate_wrapper_files_metrics(tmp_path, generate_config) -> None:
+    wrapper = generate_wrapper(tmp_path, generate_config())
+    assert '"/metrics"' in wrapper
+    requirements = (tmp_path / "wrapper_requirements.txt").read_text()
+    assert "prometheus_client" in requirements.split()
+
+
+def test_generate_wrapper_files_buildkit(tmp_path, generate_config) -> None:
+    builder = FlaskImageBuilder(
+        source_dir=".", target_dir=str(tmp_path), buildkit=True
+    )
+    dockerfile = builder.render_wrapper_files(generate_config())["Dockerfile"]
+    assert dockerfile.startswith("# syntax=docker/dockerfile:1\n")
+    assert "--mount=type=cache,target=/root/.cache/pip" in dockerfile
+    assert dockerfile.index("COPY . /app") > dockerfile.rindex("COPY --from")
+
+
+MODEL_SOURCE = """
+import pandas as pd
+
+
+class Model:
+    def predict(self, data: pd.DataFrame):
+        return data["field"] * {factor}
+"""
+
+# Always answers one row less than it was given
+SHORT_MODEL_SOURCE = """
+class Model:
+    def predict(self, data):
+        return [1] * (len(data) - 1)
+"""
+
+
+@pytest.fixture
+def load_app(tmp_path, monkeypatch) -> Iterator[Callable]:
+    """
+    Render the wrapper of a config with a model from source, and import the
+    app it defines.
+    """
+    from prometheus_client import REGISTRY
+
+    collectors = set(REGISTRY._collector_to_names)
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    def fun(config: NervosumConfig, model_source: str) -> Any:
+        (tmp_path / "a_src").mkdir()
+        (tmp_path / "a_src" / "__init__.py").write_text("")
+        (tmp_path / "a_src" / "a_module.py").write_text(model_source)
+        generate_wrapper(tmp_path, config)
+        spec = importlib.util.spec_from_file_location(
+            "wrapper", str(tmp_path / "wrapper.py")
+        )
+        wrapper = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(wrapper)  # type: ignore
+        return wrapper.app.test_client()
+
+    yield fun
+
+    for module in ["a_src", "a_src.a_module"]:
+        sys.modules.pop(module, None)
+    for collector in set(REGISTRY._collector_to_names) - collectors:
+        REGISTRY.unregister(collector)
+
+
+@pytest.mark.parametrize("enabled", [False, True])
+def test_wrapper_app(load_app, generate_config, enabled: bool) -> None:
+    config = generate_config(
+        batching={"enabled": enabled, "max_wait_ms": 1},
+        cache={"enabled": enabled},
+    )
+    client = load_app(config, MODEL_SOURCE.format(factor=2))
+
+    response = client.post("/predict", json={"field": 1.5})
+    assert response.status_code == 200
+    assert response.get_json() == {"prediction": "3.0"}
+
+    response = client.post("/predict/batch", json=[{"field": 1}, {"field": 2}])
+    assert response.get_json() == {"predictions": ["2.0", "4.0"]}
+
+    response = client.post(
+        "/predict/stream", data='{"field": 1}\n{"field": 1.5}\n'
+    )
+    assert response.get_data(as_text=True).splitlines() == [
+        '{"prediction": "2.0"}',
+        '{"prediction": "3.0"}',
+    ]
+
+    response = client.post("/predict", json={"field": "a"})
+    assert response.status_code == 400
+
+    response = client.get("/cache")
+    if enabled:
+        assert response.get_json()["hits"] == 2
+    else:
+        assert response.status_code != 200
+
+
+def test_wrapper_app_batching_too_few_predictions(
+    load_app, generate_config
+) -> None:
+    config = generate_config(
+        batching={"enabled": True, "max_batch_size": 4, "max_wait_ms": 200}
+    )
+    client = load_app(config, SHORT_MODEL_SOURCE)
+
+    def predict(value: float) -> Dict[str, Any]:
+        return client.post("/predict", json={"field": value}).get_json()
+
+    pool = ThreadPoolExecutor(4)
+    futures = [pool.submit(predict, float(i)) for i in range(4)]
+    # Fail rather than hang when requests are left without an answer
+    responses = [future.result(timeout=10) for future in futures]
+    pool.shutdown()
+    assert all("error" in response for response in responses)
+
+
+@pytest.mark.parametrize("cache", [False, True])
+def test_wrapper_app_too_few_predictions(
+    load_app, generate_config, cache: bool
+) -> None:
+    config = generate_config(cache={"enabled": cache})
+    client = load_app(config, SHORT_MODEL_SOURCE)
+    response = client.post("/predict/batch", json=[{"field": 1}, {"field": 2}])
+    assert response.status_code == 500
+    assert "1 predictions for 2 rows" in response.get_json()["error"]
+
+
+@pytest.mark.parametrize("batching", [False, True])
+def test_wrapper_app_rejects_values_out_of_range(
+    load_app, generate_config, batching: bool
+) -> None:
+    config = generate_config(batching={"enabled": batching})
+    config.input_schema[0].type = "int"
+    config.input_schema.append(SchemaField(name="extra", type="tensor"))
+    client = load_app(config, MODEL_SOURCE.format(factor=2))
+
+    for record in [{"field": 2 ** 64, "extra": 1}, {"field": 1, "extra": [1]}]:
+        response = client.post("/predict", json=record)
+        assert response.status_code == 400, record
+        response = client.post("/predict/batch", json=[record])
+        assert response.status_code == 400, record
+
+    response = client.post("/predict", json={"field": 1, "extra": "a"})
+    assert response.get_json() == {"prediction": "2"}
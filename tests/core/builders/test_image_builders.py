@@ -1,13 +1,52 @@
+from typing import Dict
+
 from nervosum.config import NervosumConfig
+from nervosum.core import index
+from nervosum.core.builders import image_builder
 from nervosum.core.builders.image_builder import ImageBuilder
 
 
 class DefaultImageBuilder(ImageBuilder):
-    def generate_wrapper_files(self, config: NervosumConfig):
-        pass
+    def render_wrapper_files(self, config: NervosumConfig) -> Dict[str, str]:
+        return {"Dockerfile": "FROM scratch"}
 
 
 def test_image_builder() -> None:
     IB = DefaultImageBuilder(source_dir="source_dir", target_dir="target_dir")
     assert IB.source_dir == "source_dir"
     assert IB.target_dir == "target_dir"
+
+
+def test_image_builder_write_wrapper_files(tmp_path) -> None:
+    IB = DefaultImageBuilder(source_dir=".", target_dir=str(tmp_path))
+    IB.write_wrapper_files({"Dockerfile": "FROM scratch"})
+    assert (tmp_path / "Dockerfile").read_text() == "FROM scratch"
+
+
+def test_image_builder_tag_image_indexes_image(
+    mocker, monkeypatch, tmp_path
+) -> None:
+    monkeypatch.setenv("NERVOSUM_HOME", str(tmp_path))
+    image_id = "sha256:" + "1" * 64
+    client = mocker.patch.object(index, "get_client").return_value
+    client.api.inspect_image.return_value = {
+        "Id": image_id,
+        "Created": "2020-01-01T00:00:00Z",
+        "RepoTags": ["nervosum/a_model:v1"],
+        "Config": {"Labels": {"name": "a_model", "tag": "v1"}},
+    }
+    docker_client = mocker.patch.object(image_builder, "get_client")
+    docker_client.return_value.api.tag.return_value = True
+    config = mocker.Mock(tag="v1")
+    config.name = "a_model"
+
+    IB = DefaultImageBuilder(source_dir=".")
+    assert IB.tag_image(config, image_id)
+    with index.ImageIndex() as image_index:
+        image = image_index.latest()
+    assert image is not None
+    assert (image.id, image.name, image.created) == (
+        image_id,
+        "a_model",
+        1577836800,
+    )
@@ -0,0 +1,200 @@
+import argparse
+import json
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+
+import pytest
+
+from nervosum.core import bench
+from nervosum.core.bench import Sample
+
+INPUT_SCHEMA = [
+    {"name": "age", "type": "int"},
+    {"name": "score", "type": "float"},
+    {"name": "city", "type": "str"},
+    {"name": "member", "type": "bool"},
+    {"name": "blob", "type": "bytes"},
+]
+
+
+class ModelHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Path the model is served under, as behind a reverse proxy
+    prefix = ""
+
+    def send_json(self, status: int, body: dict) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        if self.path == f"{self.prefix}/ready":
+            self.send_json(200, {"ready": True})
+        elif self.path == f"{self.prefix}/schema":
+            self.send_json(200, {"input_schema": INPUT_SCHEMA})
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def do_POST(self) -> None:
+        if self.path != f"{self.prefix}/predict":
+            self.send_json(404, {"error": "not found"})
+            return
+        record = json.loads(
+            self.rfile.read(int(self.headers["Content-Length"]))
+        )
+        if record["age"] % 10 == 0:
+            self.send_json(400, {"error": "age is a multiple of 10"})
+        elif record["age"] % 10 == 1:
+            # As the wrapper answers when the model raises
+            self.send_json(200, {"error": "age ends with 1"})
+        else:
+            self.send_json(200, {"prediction": 1})
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def model_url() -> Iterator[str]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ModelHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def bench_args(**kwargs) -> argparse.Namespace:
+    defaults = dict(
+        url=None,
+        concurrency=2,
+        rate=None,
+        duration=0.3,
+        warmup=0.1,
+        seed=0,
+        ready_timeout=5,
+        format="json",
+    )
+    return argparse.Namespace(**{**defaults, **kwargs})
+
+
+def test_percentile() -> None:
+    values = [float(i) for i in range(1, 101)]
+    assert bench.percentile(values, 50) == 50
+    assert bench.percentile(values, 99) == 99
+    assert bench.percentile([3.0], 95) == 3
+    assert bench.percentile([], 50) != bench.percentile([], 50)
+
+
+def test_generate_record() -> None:
+    record = bench.generate_record(INPUT_SCHEMA, random.Random(0))
+    assert isinstance(record["age"], int)
+    assert isinstance(record["score"], float)
+    assert isinstance(record["city"], str)
+    assert isinstance(record["member"], bool)
+    assert record["blob"] is None
+    assert record == bench.generate_record(INPUT_SCHEMA, random.Random(0))
+
+
+def test_summarize() -> None:
+    samples = [
+        Sample(0.0, 0.5, 200),
+        Sample(1.0, 0.001, 200),
+        Sample(1.5, 0.002, 500),
+        Sample(2.0, 0.003, None),
+        Sample(2.2, 0.004, 200, failed=True),
+        Sample(2.5, 0.5, 200),
+    ]
+    result = bench.summarize(samples, "model", "1 connections", warmup=1)
+    assert result.requests == 5
+    assert result.errors == 3
+    assert result.error_rate == 0.6
+    assert result.duration == 2
+    assert result.throughput == 1
+    assert result.p50_ms == 1
+    assert result.max_ms == 500
+
+
+def test_is_error_response() -> None:
+    assert not bench.is_error_response(b'{"prediction": "1"}')
+    assert bench.is_error_response(b'{"error": "model failed"}')
+    assert bench.is_error_response(b"<html>Bad Gateway</html>")
+
+
+def test_format_result() -> None:
+    result = bench.summarize([Sample(0, 0.1, 500)], "model", "1 rps", 0)
+    assert json.loads(bench.format_result_json(result))["p99_ms"] is None
+    assert "ERRORS         1 (100.00%)" in bench.format_result_table(result)
+
+
+@pytest.mark.parametrize("rate", [None, 50.0])
+def test_execute_url(model_url, rate, capsys) -> None:
+    bench.execute(bench_args(url=model_url, rate=rate))
+    result = json.loads(capsys.readouterr().out)
+    assert result["target"] == model_url
+    assert result["requests"] > 0
+    assert 0 < result["error_rate"] < 0.5
+    assert result["p50_ms"] <= result["p99_ms"]
+    if rate is not None:
+        assert result["load"] == "50 req/s"
+        # 50 requests per second, measured for 0.3 seconds
+        assert result["requests"] == 15
+
+
+def test_execute_url_path_prefix(capsys) -> None:
+    handler = type("PrefixedHandler", (ModelHandler,), {"prefix": "/a/model"})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/a/model/"
+    try:
+        bench.execute(bench_args(url=url))
+    finally:
+        server.shutdown()
+        server.server_close()
+    result = json.loads(capsys.readouterr().out)
+    assert result["requests"] > 0
+    assert result["error_rate"] < 0.5
+
+
+@pytest.mark.parametrize("url", ["https://127.0.0.1:1", "127.0.0.1:1"])
+def test_execute_url_requires_http(url: str) -> None:
+    with pytest.raises(SystemExit):
+        bench.execute(bench_args(url=url))
+
+
+def test_wait_until_ready_times_out() -> None:
+    with pytest.raises(TimeoutError):
+        bench.wait_until_ready("http://127.0.0.1:1", timeout=0)
+
+
+def test_execute_requires_http_image(mocker) -> None:
+    image = mocker.Mock(mode="batch")
+    mocker.patch.object(bench.run, "select_image", return_value=image)
+    start_replicas = mocker.patch.object(bench.run, "start_replicas")
+    with pytest.raises(SystemExit):
+        bench.execute(bench_args())
+    start_replicas.assert_not_called()
+
+
+def test_execute_image_replicas(model_url, mocker, capsys) -> None:
+    image = mocker.Mock(mode="http", tag="v1", short_id="0123456789ab")
+    image.name = "classifier"
+    mocker.patch.object(bench.run, "select_image", return_value=image)
+    port = model_url.rsplit(":", 1)[1]
+    containers = [mocker.Mock(status="running") for _ in range(2)]
+    for container in containers:
+        container.ports = {"5000/tcp": [{"HostPort": port}]}
+    mocker.patch.object(bench.run, "start_replicas", return_value=containers)
+    stop_containers = mocker.patch.object(bench.run, "stop_containers")
+
+    bench.execute(bench_args(balance="least-connections"))
+
+    result = json.loads(capsys.readouterr().out)
+    assert result["target"] == "classifier:v1 (0123456789ab)"
+    assert result["requests"] > 0
+    stop_containers.assert_called_once_with(containers)
@@ -0,0 +1,117 @@
+import argparse
+from unittest.mock import MagicMock
+
+import pytest
+
+from nervosum.core import build, utils
+from nervosum.core.builders.image_builder import ImageBuilder
+
+CONFIG = """
+name: a_name
+tag: a_tag
+deployment:
+  mode: http
+src: a_src
+interface:
+  model_module: a_module
+  model_class: Model
+requirements: requirements.txt
+input_schema:
+  - name: field
+    type: float
+output_schema:
+  - name: prediction
+    type: int
+"""
+
+
+@pytest.fixture
+def model_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("NERVOSUM_HOME", str(tmp_path / "home"))
+    model_dir = tmp_path / "model"
+    model_dir.mkdir()
+    (model_dir / "nervosum.yaml").write_text(CONFIG)
+    return model_dir
+
+
+def execute(
+    model_dir, mocker, force: bool = False, dry_run: bool = False
+) -> MagicMock:
+    mocker.patch.object(ImageBuilder, "tag_image", return_value=True)
+    mocker.patch.object(utils, "buildkit_available", return_value=False)
+    build_image = mocker.patch.object(
+        ImageBuilder, "build_image", return_value="sha256:an_id"
+    )
+    build.execute(
+        argparse.Namespace(
+            dir=[str(model_dir)],
+            c="nervosum.yaml",
+            force=force,
+            dry_run=dry_run,
+            cache_from=None,
+            cache_to=None,
+            jobs=4,
+        )
+    )
+    return build_image
+
+
+def test_execute_skips_unchanged_build(model_dir, mocker) -> None:
+    assert execute(model_dir, mocker).call_count == 1
+    assert execute(model_dir, mocker).call_count == 0
+    ImageBuilder.tag_image.assert_called_once()
+    assert execute(model_dir, mocker, force=True).call_count == 1
+
+    (model_dir / "model.py").write_text("changed")
+    assert execute(model_dir, mocker).call_count == 1
+
+
+def test_execute_dry_run(model_dir, mocker, capsys) -> None:
+    (model_dir / "data").mkdir()
+    (model_dir / "data" / "train.csv").write_text("a" * 5000)
+    (model_dir / ".nervosumignore").write_text("data\n")
+    assert execute(model_dir, mocker, dry_run=True).call_count == 0
+    out = capsys.readouterr().out
+    assert "Build context:" in out
+    assert "nervosum.yaml" in out
+    assert "data" not in out
+
+
+def test_execute_multiple_models(model_dir, mocker, capsys, caplog):
+    models = model_dir.parent / "models"
+    for name in ["b_model", "c_model"]:
+        (models / name).mkdir(parents=True)
+        (models / name / "nervosum.yaml").write_text(
+            CONFIG.replace("a_name", name)
+        )
+
+    assert execute(models / "*", mocker).call_count == 2
+    summary = capsys.readouterr().out.splitlines()
+    assert summary[0].startswith("MODEL")
+    assert [line.split()[1] for line in summary[1:]] == ["built", "built"]
+
+    (models / "c_model" / "nervosum.yaml").write_text("name: broken")
+    with pytest.raises(SystemExit):
+        execute(models / "*", mocker)
+    summary = capsys.readouterr().out.splitlines()
+    assert [line.split()[1] for line in summary[1:]] == ["cached", "failed"]
+    assert f"[{models / 'b_model'}] Nothing changed" in caplog.text
+
+
+def test_execute_failure_duration(model_dir, mocker, capsys) -> None:
+    clock = mocker.patch.object(build, "time")
+    clock.time.side_effect = [100.0, 107.5, 200.0, 201.0]
+    mocker.patch.object(
+        build, "build_model", side_effect=RuntimeError("daemon gone")
+    )
+    with pytest.raises(SystemExit):
+        build.execute(
+            argparse.Namespace(
+                dir=[str(model_dir), str(model_dir.parent)], jobs=1
+            )
+        )
+    summary = capsys.readouterr().out.splitlines()
+    assert [line.split()[1:] for line in summary[1:]] == [
+        ["failed", "7.5"],
+        ["failed", "1.0"],
+    ]
@@ -0,0 +1,99 @@
+import os
+from typing import Any, Dict
+
+import pytest
+
+from nervosum.config import NervosumConfig
+from nervosum.core.build_cache import BuildCache
+
+
+@pytest.fixture
+def config() -> NervosumConfig:
+    config: Dict[str, Any] = {
+        "name": "a_name",
+        "deployment": {"mode": "http"},
+        "src": "a_src",
+        "tag": "a_tag",
+        "interface": {"model_module": "a_module", "model_class": "Model"},
+        "requirements": "requirements.txt",
+        "input_schema": [{"name": "field", "type": "float"}],
+        "output_schema": [{"name": "prediction", "type": "int"}],
+    }
+    return NervosumConfig(**config)
+
+
+def test_hash_build(tmp_path, config) -> None:
+    source_dir = tmp_path / "src"
+    source_dir.mkdir()
+    (source_dir / "model.py").write_text("a")
+    cache = BuildCache(str(tmp_path / "manifest.json"))
+    wrapper_files = {"wrapper.py": "b"}
+
+    build_hash = cache.hash_build(config, wrapper_files, str(source_dir))
+    assert build_hash == cache.hash_build(
+        config, wrapper_files, str(source_dir)
+    )
+    assert build_hash != cache.hash_build(
+        config, {"wrapper.py": "c"}, str(source_dir)
+    )
+    config.tag = "b_tag"
+    assert build_hash != cache.hash_build(
+        config, wrapper_files, str(source_dir)
+    )
+    (source_dir / "model.py").write_text("changed")
+    config.tag = "a_tag"
+    assert build_hash != cache.hash_build(
+        config, wrapper_files, str(source_dir)
+    )
+
+
+def test_build_cache_manifest(tmp_path) -> None:
+    manifest = tmp_path / "manifest.json"
+    cache = BuildCache(str(manifest))
+    assert cache.get_image("a_hash") is None
+    cache.add_image("a_hash", "sha256:an_id")
+    cache.save()
+    assert BuildCache(str(manifest)).get_image("a_hash") == "sha256:an_id"
+
+    manifest.write_text("{")
+    assert BuildCache(str(manifest)).get_image("a_hash") is None
+
+
+def test_hash_file_memoised(tmp_path) -> None:
+    file = tmp_path / "file"
+    file.write_text("content")
+    cache = BuildCache(str(tmp_path / "manifest.json"))
+    file_hash = cache.hash_file(str(file))
+
+    # Same size and modification time, so the file is not read again
+    stat = file.stat()
+    file.write_text("CONTENT")
+    os.utime(str(file), ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert cache.hash_file(str(file)) == file_hash
+
+    file.write_text("changed")
+    assert cache.hash_file(str(file)) != file_hash
+
+
+def test_hash_build_forgets_removed_files(tmp_path, config) -> None:
+    source_dir = tmp_path / "src"
+    source_dir.mkdir()
+    (source_dir / "model.py").write_text("a")
+    (source_dir / "old.py").write_text("b")
+    other_file = tmp_path / "other.py"
+    other_file.write_text("c")
+    manifest = tmp_path / "manifest.json"
+    cache = BuildCache(str(manifest))
+    cache.hash_file(str(other_file))
+    cache.hash_build(config, {}, str(source_dir))
+    cache.save()
+
+    (source_dir / "old.py").unlink()
+    cache = BuildCache(str(manifest))
+    cache.hash_build(config, {}, str(source_dir))
+    cache.save()
+    files = BuildCache(str(manifest)).files
+    assert str(source_dir / "model.py") in files
+    assert str(source_dir / "old.py") not in files
+    # Files outside the hashed source directory are kept
+    assert str(other_file) in files
@@ -0,0 +1,86 @@
+import io
+import os
+import tarfile
+
+import pytest
+
+from nervosum.core.build_context import (
+    IgnoreRules,
+    get_context_size,
+    iter_source_files,
+    stream_build_context,
+)
+
+
+def test_stream_build_context(tmp_path) -> None:
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "model.bin").write_bytes(b"\1" * 1000)
+    (tmp_path / "run.sh").write_text("#!/bin/sh")
+    os.chmod(str(tmp_path / "run.sh"), 0o755)
+    (tmp_path / "Dockerfile").write_text("FROM user")
+
+    context = b"".join(
+        stream_build_context(str(tmp_path), {"Dockerfile": "FROM wrapper"})
+    )
+    assert len(context) % 512 == 0
+    with tarfile.open(fileobj=io.BytesIO(context)) as tar:
+        names = tar.getnames()
+        assert sorted(names) == [
+            "Dockerfile",
+            "run.sh",
+            "sub",
+            "sub/model.bin",
+        ]
+        assert tar.getmember("sub").isdir()
+        assert tar.getmember("run.sh").mode == 0o755
+        assert tar.extractfile("sub/model.bin").read() == b"\1" * 1000
+        assert tar.extractfile("Dockerfile").read() == b"FROM wrapper"
+
+
+@pytest.mark.parametrize(
+    ["path", "ignored"],
+    [
+        (".git", True),
+        (".git/HEAD", True),
+        ("src/__pycache__/model.pyc", True),
+        ("data/train.csv", True),
+        ("data/keep.csv", False),
+        ("venv/bin/python", True),
+        ("src/model.py", False),
+        ("src/venv", False),
+    ],
+)
+def test_ignore_rules(path: str, ignored: bool) -> None:
+    rules = IgnoreRules(
+        [
+            "# comment",
+            ".git",
+            "**/__pycache__",
+            "data/*.csv",
+            "!data/keep.csv",
+            "/venv",
+        ]
+    )
+    assert rules.ignored(path) == ignored
+
+
+def test_ignore_file_fallback(tmp_path) -> None:
+    (tmp_path / ".dockerignore").write_text("*.bin")
+    (tmp_path / "model.bin").write_text("a")
+    assert [name for name, _ in iter_source_files(str(tmp_path))] == [
+        ".dockerignore"
+    ]
+    (tmp_path / ".nervosumignore").write_text("*.txt")
+    assert "model.bin" in [
+        name for name, _ in iter_source_files(str(tmp_path))
+    ]
+
+
+def test_get_context_size(tmp_path) -> None:
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "model.bin").write_bytes(b"\1" * 1000)
+    wrapper_files = {"Dockerfile": "FROM wrapper"}
+    total, sizes = get_context_size(str(tmp_path), wrapper_files)
+    context = b"".join(stream_build_context(str(tmp_path), wrapper_files))
+    assert total == len(context)
+    assert set(sizes) == {"Dockerfile", "sub"}
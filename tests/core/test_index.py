@@ -0,0 +1,181 @@
+from typing import Any, Dict, List
+
+import pytest
+from docker.errors import NotFound
+
+from nervosum.core import index
+from nervosum.core.index import ImageFilter, ImageIndex, ImageRecord
+
+
+def record(i: int, **labels: str) -> ImageRecord:
+    return ImageRecord.from_labels(
+        "sha256:" + str(i) * 64,
+        1577836800 + i,
+        {"owner": "nervosum", **labels},
+    )
+
+
+def inspect(i: int, **labels: str) -> Dict[str, Any]:
+    return {
+        "Id": "sha256:" + str(i) * 64,
+        "Created": f"2020-01-01T00:00:0{i}.123456789Z",
+        "RepoTags": ["nervosum/a_model:latest"],
+        "Config": {"Labels": labels},
+    }
+
+
+@pytest.fixture
+def image_index(tmp_path):
+    with ImageIndex(str(tmp_path / "index.db")) as image_index:
+        for r in [
+            record(1, name="classifier", tag="v1.0", mode="http"),
+            record(2, name="classifier", tag="v1.1", mode="http"),
+            record(3, name="spark_job", tag="v2.0", mode="batch"),
+            record(4, name="no_tag"),
+        ]:
+            image_index.add(r)
+        yield image_index
+
+
+@pytest.fixture
+def client(mocker):
+    client = mocker.patch.object(index, "get_client").return_value
+    client.api.info.return_value = {"ID": "a_daemon"}
+    return client
+
+
+@pytest.mark.parametrize(
+    ["filters", "limit", "expected"],
+    [
+        ([], None, [4, 3, 2, 1]),
+        ([], 2, [4, 3]),
+        (["name=classifier"], None, [2, 1]),
+        (["name=class"], None, []),
+        (["name=class*"], 1, [2]),
+        (["tag=v1.0"], None, [1]),
+        (["id=3333"], None, [3]),
+        (["id=sha256:1111"], None, [1]),
+        (["owner=nerv*", "mode=http"], 1, [2]),
+        (["owner=other"], None, []),
+    ],
+)
+def test_query(
+    image_index, filters: List[str], limit: int, expected: List[int]
+) -> None:
+    records = image_index.query([ImageFilter.parse(f) for f in filters], limit)
+    assert [int(r.short_id[0]) for r in records] == expected
+
+
+def test_query_prefix(image_index) -> None:
+    assert image_index.query([ImageFilter.parse("name=no%*")]) == []
+    assert image_index.query([ImageFilter.parse("name=spark_*")])
+    assert image_index.query([ImageFilter.parse("name=Class*")]) == []
+    assert len(image_index.query([ImageFilter.parse("name=*")])) == 4
+
+
+def test_query_prefix_uses_index(image_index) -> None:
+    plan = image_index.connection.execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM images "
+        "WHERE name >= ? AND name < ?",
+        ("class", index.prefix_upper_bound("class")),
+    ).fetchall()
+    assert "USING INDEX images_name" in str(plan)
+
+
+@pytest.mark.parametrize(
+    ["prefix", "expected"],
+    [
+        ("class", "clast"),
+        ("a\U0010ffff", "b"),
+        ("\U0010ffff", None),
+        ("", None),
+        ("\ud7ff", "\ue000"),
+    ],
+)
+def test_prefix_upper_bound(prefix: str, expected: str) -> None:
+    assert index.prefix_upper_bound(prefix) == expected
+
+
+def test_latest(image_index) -> None:
+    latest = image_index.latest([ImageFilter.parse("name=classifier")])
+    assert latest is not None and latest.tag == "v1.1"
+    assert image_index.latest([ImageFilter.parse("name=missing")]) is None
+
+
+def test_add_replaces_record(image_index) -> None:
+    image_index.add(record(1, name="renamed"))
+    assert image_index.latest([ImageFilter.parse("name=classifier")]).tag == (
+        "v1.1"
+    )
+    assert len(image_index.query()) == 4
+
+
+def test_from_inspect() -> None:
+    image = ImageRecord.from_inspect(inspect(5, name="a_model", mode="http"))
+    assert image.created == 1577836805
+    assert (image.name, image.tag, image.mode) == ("a_model", None, "http")
+
+
+def test_sync_rebuilds_empty_index(tmp_path, client) -> None:
+    client.api.images.return_value = [
+        {"Id": "sha256:" + "1" * 64, "Created": 1577836801, "Labels": None}
+    ]
+    with ImageIndex(str(tmp_path / "index.db")) as image_index:
+        image_index.sync()
+        assert [r.short_id for r in image_index.query()] == ["1" * 12]
+        assert image_index.get_last_sync() is not None
+    client.api.events.assert_not_called()
+
+
+def test_sync_applies_events(image_index, client, mocker) -> None:
+    mocker.patch.object(index.time, "time", return_value=2000)
+    image_index.set_last_sync(1990)
+    image_index.set_meta("daemon_id", "a_daemon")
+    client.api.events.return_value = [
+        {"Type": "image", "Action": "tag", "id": "sha256:" + "5" * 64},
+        {"Type": "image", "Action": "delete", "id": "sha256:" + "1" * 64},
+        {"Type": "image", "Action": "untag", "Actor": {"ID": "sha256:22"}},
+    ]
+
+    def inspect_image(image_id: str) -> Dict[str, Any]:
+        if image_id.startswith("sha256:5"):
+            return inspect(5, name="classifier", tag="v1.2")
+        if image_id.startswith("sha256:2"):
+            return {**inspect(2), "RepoTags": ["other:latest"]}
+        raise NotFound("No such image")
+
+    client.api.inspect_image.side_effect = inspect_image
+    image_index.sync()
+
+    client.api.images.assert_not_called()
+    assert client.api.events.call_args[1] == {
+        "since": 1990 - index.SYNC_OVERLAP_SECONDS,
+        "until": 2000,
+        "filters": {"type": "image"},
+        "decode": True,
+    }
+    records = image_index.query([ImageFilter.parse("name=classifier")])
+    assert [r.tag for r in records] == ["v1.2"]
+    assert image_index.get_last_sync() == 2000
+
+
+def test_sync_rebuilds_stale_index(image_index, client, mocker) -> None:
+    mocker.patch.object(index.time, "time", return_value=10000)
+    image_index.set_last_sync(10000 - index.FULL_SYNC_SECONDS - 1)
+    client.api.images.return_value = []
+    image_index.sync()
+    client.api.events.assert_not_called()
+    assert image_index.query() == []
+
+
+def test_sync_rebuilds_index_of_other_daemon(
+    image_index, client, mocker
+) -> None:
+    mocker.patch.object(index.time, "time", return_value=2000)
+    image_index.set_last_sync(1990)
+    image_index.set_meta("daemon_id", "other_daemon")
+    client.api.images.return_value = []
+    image_index.sync()
+    client.api.events.assert_not_called()
+    assert image_index.query() == []
+    assert image_index.get_meta("daemon_id") == "a_daemon"
@@ -0,0 +1,89 @@
+import argparse
+import json
+from typing import Any, Dict, List
+
+import pytest
+
+from nervosum.core import index
+from nervosum.core import list as nervosum_list
+from nervosum.core.list import ImageFilter, ImageRecord
+
+
+def summary(i: int, **labels: str) -> Dict[str, Any]:
+    return {
+        "Id": "sha256:" + str(i) * 64,
+        "Created": 1577836800 + i,
+        "Labels": {"owner": "nervosum", **labels},
+    }
+
+
+SUMMARIES = [
+    summary(1, name="classifier", tag="v1.0", mode="http"),
+    summary(2, name="classifier", tag="v1.1", mode="http"),
+    summary(3, name="spark_job", tag="v2.0", mode="batch"),
+    summary(4, name="no_tag"),
+]
+
+
+@pytest.fixture
+def images_api(mocker, monkeypatch, tmp_path):
+    monkeypatch.setenv("NERVOSUM_HOME", str(tmp_path))
+    client = mocker.patch.object(index, "get_client").return_value
+    client.api.info.return_value = {"ID": "a_daemon"}
+    client.api.images.return_value = SUMMARIES
+    return client.api.images
+
+
+@pytest.mark.parametrize(
+    ["a_filter", "expected"],
+    [
+        ("name=classifier", [1, 2]),
+        ("name=class", []),
+        ("tag=v1*", [1, 2]),
+        ("tag=v1.0", [1]),
+        ("id=222222", [2]),
+        ("id=sha256:3333", [3]),
+    ],
+)
+def test_image_filter(a_filter: str, expected: List[int]) -> None:
+    image_filter = ImageFilter.parse(a_filter)
+    records = [ImageRecord.from_summary(s) for s in SUMMARIES]
+    assert [
+        SUMMARIES.index(s) + 1
+        for s, record in zip(SUMMARIES, records)
+        if image_filter.matches(record)
+    ] == expected
+
+
+def test_image_filter_invalid() -> None:
+    with pytest.raises(ValueError):
+        ImageFilter.parse("classifier")
+
+
+def test_get_images(images_api) -> None:
+    images = nervosum_list.get_images(["name=classifier", "tag=v1*"])
+    assert images_api.call_args[1]["filters"] == {"reference": "nervosum/*"}
+    assert [image.tag for image in images] == ["v1.1", "v1.0"]
+
+
+def test_get_images_applies_all_filters(images_api) -> None:
+    images = nervosum_list.get_images(["tag=v1*", "mode=batch*"])
+    assert images == []
+
+
+def test_execute_json(images_api, capsys) -> None:
+    nervosum_list.execute(
+        argparse.Namespace(filter=None, format="json", limit=2)
+    )
+    images = json.loads(capsys.readouterr().out)
+    assert [image["name"] for image in images] == ["no_tag", "spark_job"]
+    assert images[0]["created"] == "2020-01-01T00:00:04Z"
+
+
+def test_execute_table(images_api, capsys) -> None:
+    nervosum_list.execute(
+        argparse.Namespace(filter=["mode=http"], format="table", limit=None)
+    )
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].startswith("TAG")
+    assert len(lines) == 3
@@ -0,0 +1,83 @@
+import asyncio
+from typing import List, Tuple
+
+import pytest
+
+from nervosum.core.proxy import Backend, LoadBalancer, TCPProxy
+
+
+def backends(count: int) -> List[Backend]:
+    return [Backend("127.0.0.1", 8000 + i) for i in range(count)]
+
+
+def test_round_robin() -> None:
+    balancer = LoadBalancer(backends(3))
+    assert [balancer.choose().port for _ in range(4)] == [
+        8000,
+        8001,
+        8002,
+        8000,
+    ]
+
+
+def test_least_connections() -> None:
+    balancer = LoadBalancer(backends(3), "least-connections")
+    balancer.backends[0].connections = 2
+    balancer.backends[1].connections = 1
+    assert balancer.choose().port == 8002
+    balancer.backends[2].connections = 3
+    assert balancer.choose().port == 8001
+
+
+def test_choose_skips_excluded() -> None:
+    balancer = LoadBalancer(backends(2))
+    assert balancer.choose(exclude=[balancer.backends[0]]).port == 8001
+
+
+def test_invalid_balancer() -> None:
+    with pytest.raises(ValueError):
+        LoadBalancer([])
+    with pytest.raises(ValueError):
+        LoadBalancer(backends(1), "random")
+
+
+async def start_backend(name: bytes) -> Tuple[asyncio.AbstractServer, int]:
+    async def handle(reader, writer) -> None:
+        data = await reader.read(100)
+        writer.write(name + b":" + data)
+        await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, server.sockets[0].getsockname()[1]
+
+
+async def request(port: int, data: bytes) -> bytes:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(data)
+    writer.write_eof()
+    response = await reader.read()
+    writer.close()
+    return response
+
+
+def test_proxy_balances_connections() -> None:
+    async def run() -> List[bytes]:
+        (a, a_port), (b, b_port) = [
+            await start_backend(name) for name in [b"a", b"b"]
+        ]
+        # Nothing listens on the first backend, connections move on
+        dead = Backend("127.0.0.1", 1)
+        balancer = LoadBalancer(
+            [dead, Backend("127.0.0.1", a_port), Backend("127.0.0.1", b_port)]
+        )
+        proxy = TCPProxy(balancer, port=0)
+        port = await proxy.start()
+        try:
+            return [await request(port, b"ping") for _ in range(3)]
+        finally:
+            await proxy.close()
+            a.close()
+            b.close()
+
+    assert asyncio.run(run()) == [b"a:ping", b"b:ping", b"a:ping"]
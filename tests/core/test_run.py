@@ -0,0 +1,107 @@
+import argparse
+import asyncio
+
+import pytest
+
+from nervosum.core import run
+from nervosum.core.index import ImageRecord
+
+IMAGE = ImageRecord.from_labels(
+    "sha256:" + "1" * 64, 1577836800, {"name": "classifier", "mode": "http"}
+)
+
+
+def run_args(**kwargs) -> argparse.Namespace:
+    defaults = dict(
+        name="classifier",
+        tag=None,
+        port=5000,
+        replicas=1,
+        balance="round-robin",
+        cpus=None,
+        memory=None,
+    )
+    return argparse.Namespace(**{**defaults, **kwargs})
+
+
+@pytest.fixture
+def client(mocker):
+    mocker.patch.object(run, "get_images", return_value=[IMAGE])
+    return mocker.patch.object(run, "get_client").return_value
+
+
+def test_resource_limits() -> None:
+    assert run.get_resource_limits(run_args()) == {}
+    assert run.get_resource_limits(run_args(cpus=1.5, memory="2g")) == {
+        "nano_cpus": 1500000000,
+        "mem_limit": "2g",
+    }
+
+
+def test_start_replicas(client) -> None:
+    container = client.containers.run.return_value
+    container.ports = {"5000/tcp": [{"HostIp": "127.0.0.1", "HostPort": "4"}]}
+    containers = run.start_replicas(IMAGE, run_args(replicas=3, cpus=2))
+    assert len(containers) == 3
+    assert run.get_host_port(containers[0]) == 4
+    assert client.containers.run.call_args[1] == {
+        "detach": True,
+        "ports": {"5000/tcp": ("127.0.0.1", None)},
+        "nano_cpus": 2000000000,
+    }
+
+
+def test_start_replicas_stops_started_on_failure(client) -> None:
+    container = client.containers.run.return_value
+    client.containers.run.side_effect = [container, RuntimeError("no space")]
+    with pytest.raises(RuntimeError):
+        run.start_replicas(IMAGE, run_args(replicas=2))
+    container.stop.assert_called_once_with(timeout=0)
+
+
+def test_execute_single_replica(client, mocker) -> None:
+    mocker.patch.object(run, "add_kill_signal")
+    mocker.patch.object(run.streaming, "print_stream")
+    run.execute(run_args(port=8080, memory="1g"))
+    assert client.containers.run.call_args[1] == {
+        "detach": True,
+        "ports": {"5000/tcp": 8080},
+        "mem_limit": "1g",
+    }
+
+
+def test_execute_single_replica_any_port(client, mocker) -> None:
+    mocker.patch.object(run, "add_kill_signal")
+    mocker.patch.object(run.streaming, "print_stream")
+    info = mocker.patch.object(run.logger, "info")
+    container = client.containers.run.return_value
+    container.ports = {"5000/tcp": [{"HostIp": "0.0.0.0", "HostPort": "4"}]}
+    run.execute(run_args(port=0))
+    assert client.containers.run.call_args[1]["ports"] == {"5000/tcp": 0}
+    container.reload.assert_called_once_with()
+    info.assert_any_call("Serving on http://127.0.0.1:4")
+
+
+def test_execute_replicas_requires_http(client, mocker) -> None:
+    batch_image = IMAGE._replace(mode="batch")
+    mocker.patch.object(run, "get_images", return_value=[batch_image])
+    with pytest.raises(SystemExit):
+        run.execute(run_args(replicas=2))
+    client.containers.run.assert_not_called()
+
+
+def test_serve_replicas_stops_all(mocker, capsys) -> None:
+    containers = []
+    for i in range(2):
+        container = mocker.Mock()
+        container.ports = {"5000/tcp": [{"HostPort": str(4000 + i)}]}
+        container.attach.return_value = [f"started {i}\n".encode("utf-8")]
+        containers.append(container)
+
+    asyncio.run(run.serve_replicas(containers, run_args(replicas=2, port=0)))
+
+    out = capsys.readouterr().out
+    assert "[replica 1] started 0\n" in out
+    assert "[replica 2] started 1\n" in out
+    for container in containers:
+        container.stop.assert_called_once_with(timeout=0)
@@ -0,0 +1,35 @@
+from nervosum.config import SchemaField
+from nervosum.core import schema
+
+
+def test_compile_schema() -> None:
+    fields = [
+        SchemaField(name="a", type="int"),
+        SchemaField(name="b", type="float"),
+        SchemaField(name="c", type="str"),
+        SchemaField(name="d", type="bool"),
+    ]
+    compiled = schema.compile_schema(fields)
+    assert [f.name for f in compiled] == ["a", "b", "c", "d"]
+    assert [f.dtype for f in compiled] == [
+        "int64",
+        "float64",
+        "object",
+        "bool",
+    ]
+    assert compiled[1].python_types == ("int", "float")
+
+
+def test_compile_schema_unknown_type() -> None:
+    compiled = schema.compile_schema([SchemaField(name="a", type="a_type")])
+    assert compiled[0].dtype == "object"
+    assert compiled[0].python_types == ()
+
+
+def test_to_spark_ddl() -> None:
+    fields = [
+        SchemaField(name="a", type="int"),
+        SchemaField(name="b", type="float"),
+    ]
+    ddl = schema.to_spark_ddl(schema.compile_schema(fields))
+    assert ddl == "`a` bigint, `b` double"
@@ -0,0 +1,154 @@
+import asyncio
+import io
+import json
+from typing import AsyncIterator, Iterable, List
+
+import pytest
+
+from nervosum.core import streaming
+from nervosum.core.streaming import BuildEvent, JSONStreamDecoder
+
+
+def split(data: bytes, size: int) -> List[bytes]:
+    chunks = []
+    for start in range(0, len(data), size):
+        end = start + size
+        chunks.append(data[start:end])
+    return chunks
+
+
+def build_output(*messages: dict) -> bytes:
+    return b"".join(json.dumps(m).encode("utf-8") + b"\r\n" for m in messages)
+
+
+BUILD_OUTPUT = build_output(
+    {"stream": "Step 1/2 : FROM python:3.7-slim\n"},
+    {"stream": " ---> 0123456789ab\n"},
+    {"stream": "Step 2/2 : COPY . /app\n"},
+    {"stream": " ---> Using cache\n"},
+    {"stream": " ---> ba98"},
+    {"stream": "76543210\n"},
+    {"aux": {"ID": "sha256:an_id"}},
+    {"stream": "Successfully built ba9876543210\n"},
+)
+
+
+async def aiter(chunks: Iterable[bytes]) -> AsyncIterator[bytes]:
+    for chunk in chunks:
+        yield chunk
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 1000])
+def test_iter_json_across_chunks(size: int) -> None:
+    data = build_output({"stream": "é ☃\n"}, {"aux": {"ID": "x"}})
+    assert list(streaming.iter_json(split(data, size))) == [
+        {"stream": "é ☃\n"},
+        {"aux": {"ID": "x"}},
+    ]
+
+
+def test_json_stream_decoder_skips_invalid_lines(caplog) -> None:
+    decoder = JSONStreamDecoder()
+    assert decoder.feed(b'{"a": 1}{"b"') == [{"a": 1}]
+    assert decoder.feed(b': 2}\nnot json\n{"c": 3}\n{"d":') == [
+        {"b": 2},
+        {"c": 3},
+    ]
+    assert decoder.close() == []
+    assert "not json" in caplog.text
+    assert "Stream ended" in caplog.text
+
+
+def test_iter_build_events() -> None:
+    events = list(streaming.iter_build_events(split(BUILD_OUTPUT, 10)))
+    assert events[0] == BuildEvent(
+        "step", "Step 1/2 : FROM python:3.7-slim", 1, 2
+    )
+    assert events[3] == BuildEvent("cache_hit", " ---> Using cache", 2, 2)
+    assert events[4] == BuildEvent("output", " ---> ba9876543210", 2, 2)
+    assert events[5] == BuildEvent("image", "sha256:an_id", 2, 2)
+    assert len(events) == 7
+
+
+def test_aiter_build_events() -> None:
+    async def collect() -> List[BuildEvent]:
+        chunks = aiter(split(BUILD_OUTPUT, 10))
+        return [e async for e in streaming.aiter_build_events(chunks)]
+
+    events = asyncio.run(collect())
+    assert events == list(streaming.iter_build_events([BUILD_OUTPUT]))
+
+
+def test_iter_batches() -> None:
+    batches = list(streaming.iter_batches(range(100)))
+    assert [i for batch in batches for i in batch] == list(range(100))
+    assert all(batches)
+
+
+def test_iter_batches_raises_after_items() -> None:
+    def failing() -> Iterable[int]:
+        yield 1
+        raise RuntimeError("stream broke")
+
+    items = []
+    with pytest.raises(RuntimeError):
+        for batch in streaming.iter_batches(failing()):
+            items.extend(batch)
+    assert items == [1]
+
+
+def test_line_writer() -> None:
+    out = io.StringIO()
+    writer = streaming.LineWriter("[a] ", out)
+    writer.write("Step 1/2")
+    writer.write(" : FROM x\nStep 2/2\n")
+    writer.flush()
+    assert out.getvalue() == "[a] Step 1/2 : FROM x\n[a] Step 2/2\n"
+    writer.write("done")
+    writer.flush(final=True)
+    assert out.getvalue().endswith("[a] done\n")
+
+
+def test_print_lines(capsys) -> None:
+    streaming.print_lines(
+        ["Step 1/2", " : FROM x\nStep 2/2\n", "done"], "[a] "
+    )
+    assert capsys.readouterr().out == (
+        "[a] Step 1/2 : FROM x\n[a] Step 2/2\n[a] done\n"
+    )
+
+
+def test_print_stream_without_prefix(capsys) -> None:
+    streaming.print_stream(split("prompt> ☃".encode("utf-8"), 2))
+    assert capsys.readouterr().out == "prompt> ☃"
+
+
+def test_aprint_stream(capsys) -> None:
+    asyncio.run(streaming.aprint_stream(aiter([b"a\nb", b"c\n"]), "[1] "))
+    assert capsys.readouterr().out == "[1] a\n[1] bc\n"
+
+
+def test_print_build_stream(capsys) -> None:
+    image_id = streaming.print_build_stream(split(BUILD_OUTPUT, 5), "[a] ")
+    out = capsys.readouterr().out.splitlines()
+    assert image_id == "sha256:an_id"
+    assert out[0] == "[a] Step 1/2 : FROM python:3.7-slim"
+    assert out[-1] == "[a] Reused cached layers for 1/2 steps"
+
+
+def test_print_build_stream_error(capsys) -> None:
+    output = build_output(
+        {"stream": "Step 1/1 : RUN false\n"},
+        {"error": "The command returned a non-zero code: 1"},
+    )
+    assert streaming.print_build_stream([output]) is None
+    assert capsys.readouterr().out.splitlines()[-1] == (
+        "The command returned a non-zero code: 1"
+    )
+
+
+def test_aiter_blocking() -> None:
+    async def collect() -> List[int]:
+        return [i async for i in streaming.aiter_blocking(range(3))]
+
+    assert asyncio.run(collect()) == [0, 1, 2]
@@ -0,0 +1,150 @@
+import importlib.util
+import os
+import subprocess
+import sys
+import tempfile
+import zipfile
+from importlib.machinery import EXTENSION_SUFFIXES
+from types import ModuleType
+
+import _bisect
+import pytest
+
+import nervosum
+
+MODULE_PATH = os.path.join(
+    os.path.dirname(nervosum.__file__),
+    "templates",
+    "batch",
+    "pydzipimport_linux.py",
+)
+
+# Imports the extension module of the archive in a fresh process and prints
+# where it was extracted to.
+EXTRACT_SCRIPT = """
+import importlib.util
+import sys
+
+spec = importlib.util.spec_from_file_location("pydzipimport", sys.argv[1])
+pydzipimport = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(pydzipimport)
+importer = pydzipimport.PydZipImporter(sys.argv[2])
+loader, _ = importer.find_loader("pkg._bisect")
+loader.load_module("pkg._bisect")
+print(loader.filename)
+"""
+
+
+def load_module() -> ModuleType:
+    spec = importlib.util.spec_from_file_location("pydzipimport", MODULE_PATH)
+    assert spec is not None and spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def pydzipimport(tmp_path, monkeypatch) -> ModuleType:
+    module = load_module()
+    monkeypatch.setattr(module, "CACHE_DIR", str(tmp_path / "cache"))
+    return module
+
+
+@pytest.fixture
+def archive(tmp_path) -> str:
+    """Archive holding a package with a C extension module."""
+    path = str(tmp_path / "deps.zip")
+    with zipfile.ZipFile(path, "w") as f:
+        f.writestr("pkg/__init__.py", "")
+        f.write(_bisect.__file__, "pkg/_bisect" + EXTENSION_SUFFIXES[0])
+    return path
+
+
+def test_import_extension_module(pydzipimport, archive) -> None:
+    importer = pydzipimport.PydZipImporter(os.path.join(archive, "pkg"))
+    loader, _ = importer.find_loader("pkg._bisect")
+    try:
+        module = loader.load_module("pkg._bisect")
+        assert module.bisect_left([1, 2, 3], 2) == 1
+        assert module.__file__.startswith(archive)
+    finally:
+        sys.modules.pop("pkg._bisect", None)
+    assert loader.filename.startswith(pydzipimport.CACHE_DIR)
+
+
+def test_second_importer_reuses_extracted_file(
+    pydzipimport, archive, monkeypatch
+) -> None:
+    loader, _ = pydzipimport.PydZipImporter(
+        os.path.join(archive, "pkg")
+    ).find_loader("pkg._bisect")
+
+    # As in another process, nothing is known about the archive.
+    pydzipimport._indexes.clear()
+
+    def get_data(self, path: str) -> bytes:
+        raise AssertionError(f"{path} extracted again")
+
+    monkeypatch.setattr(pydzipimport.PydZipImporter, "get_data", get_data)
+    importer = pydzipimport.PydZipImporter(os.path.join(archive, "pkg"))
+    second_loader, _ = importer.find_loader("pkg._bisect")
+    assert second_loader.filename == loader.filename
+
+
+def test_other_process_reuses_extracted_file(
+    pydzipimport, archive, monkeypatch
+) -> None:
+    process = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            EXTRACT_SCRIPT,
+            MODULE_PATH,
+            os.path.join(archive, "pkg"),
+        ],
+        env={**os.environ, "PYDZIPIMPORT_CACHE_DIR": pydzipimport.CACHE_DIR},
+        stdout=subprocess.PIPE,
+        check=True,
+    )
+
+    def get_data(self, path: str) -> bytes:
+        raise AssertionError(f"{path} extracted again")
+
+    monkeypatch.setattr(pydzipimport.PydZipImporter, "get_data", get_data)
+    importer = pydzipimport.PydZipImporter(os.path.join(archive, "pkg"))
+    loader, _ = importer.find_loader("pkg._bisect")
+    assert loader.filename == process.stdout.decode().strip()
+
+
+def test_cache_dir_follows_archive_changes(pydzipimport, archive) -> None:
+    key = pydzipimport._archive_key(archive)
+    assert pydzipimport._archive_key(archive) == key
+    with zipfile.ZipFile(archive, "a") as f:
+        f.writestr("pkg/other.py", "")
+    assert pydzipimport._archive_key(archive) != key
+
+
+def test_default_cache_dir_per_user(monkeypatch) -> None:
+    monkeypatch.delenv("PYDZIPIMPORT_CACHE_DIR", raising=False)
+    assert load_module().CACHE_DIR == os.path.join(
+        tempfile.gettempdir(), f"pydzipimport-{os.getuid()}"
+    )
+
+
+@pytest.mark.parametrize("mode", [0o770, 0o757])
+def test_cache_dir_writable_by_others(
+    pydzipimport, archive, mode: int
+) -> None:
+    os.makedirs(pydzipimport.CACHE_DIR)
+    os.chmod(pydzipimport.CACHE_DIR, mode)
+    importer = pydzipimport.PydZipImporter(os.path.join(archive, "pkg"))
+    with pytest.raises(ImportError):
+        importer.find_loader("pkg._bisect")
+
+
+def test_cache_dir_symlink(pydzipimport, archive, tmp_path) -> None:
+    (tmp_path / "elsewhere").mkdir(mode=0o700)
+    os.symlink(str(tmp_path / "elsewhere"), pydzipimport.CACHE_DIR)
+    importer = pydzipimport.PydZipImporter(os.path.join(archive, "pkg"))
+    with pytest.raises(ImportError):
+        importer.find_loader("pkg._bisect")
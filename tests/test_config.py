@@ -91,3 +91,67 @@ def test_get_config_mode_unsupported(tmp_path, generate_config) -> None:
     file.write_text(generate_config(mode="unsupported"))
     with pytest.raises(ValidationError):
         get_config(file)
+
+
+def test_get_config_batching_default(tmp_path, generate_config) -> None:
+    file = tmp_path / "file"
+    file.write_text(generate_config(mode="http"))
+    config = get_config(file)
+    assert config.deployment.batching.enabled is False
+    assert config.deployment.batching.max_batch_size == 32
+
+
+def test_get_config_batching_invalid(tmp_path, generate_config) -> None:
+    file = tmp_path / "file"
+    file.write_text(generate_config(mode="http"))
+    config = get_config(file).dict()
+    config["deployment"]["batching"] = {"enabled": True, "max_batch_size": 0}
+    with pytest.raises(ValidationError):
+        NervosumConfig(**config)
+
+
+def test_get_config_server_engine_unsupported(tmp_path, generate_config):
+    file = tmp_path / "file"
+    file.write_text(generate_config(mode="http"))
+    config = get_config(file).dict()
+    config["deployment"]["server"] = {"engine": "unsupported"}
+    with pytest.raises(ValidationError):
+        NervosumConfig(**config)
+
+
+def test_get_config_server_preload_flask(tmp_path, generate_config) -> None:
+    file = tmp_path / "file"
+    file.write_text(generate_config(mode="http"))
+    config = get_config(file).dict()
+    config["deployment"]["server"] = {"engine": "flask", "preload": True}
+    with pytest.raises(ValidationError):
+        NervosumConfig(**config)
+
+
+def test_get_config_binary_format_unsupported(tmp_path, generate_config):
+    file = tmp_path / "file"
+    file.write_text(generate_config(mode="http"))
+    config = get_config(file).dict()
+    config["deployment"]["binary_formats"] = ["arrow", "unsupported"]
+    with pytest.raises(ValidationError):
+        NervosumConfig(**config)
+
+
+def test_get_config_cache_non_deterministic(tmp_path, generate_config):
+    file = tmp_path / "file"
+    file.write_text(generate_config(mode="http"))
+    config = get_config(file).dict()
+    config["deployment"]["cache"] = {"enabled": True}
+    assert NervosumConfig(**config).deployment.cache.enabled
+    config["interface"]["deterministic"] = False
+    with pytest.raises(ValidationError):
+        NervosumConfig(**config)
+
+
+def test_get_config_source_format_unsupported(tmp_path, generate_config):
+    file = tmp_path / "file"
+    file.write_text(generate_config(platform_tag="a_platform_tag"))
+    config = get_config(file).dict()
+    config["deployment"]["source"] = {"format": "unsupported"}
+    with pytest.raises(ValidationError):
+        NervosumConfig(**config)